@@ -1,16 +1,13 @@
 #!/usr/bin/python3
 """Defining the HBnB Console"""
 import cmd
+import json
 import re
+from ast import literal_eval
 from shlex import split
 from models import storage
-from models.base_model import BaseModel
-from models.user import User
-from models.state import State
-from models.city import City
-from models.place import Place
-from models.amenity import Amenity
-from models.review import Review
+from models.base_model import declared, registry
+from models.engine.query import condition
 
 
 def parse(arg):
@@ -31,6 +28,41 @@ def parse(arg):
         return retl
 
 
+def literal(arg):
+    """Return the Python literal arg spells, or arg itself if it is
+    not one."""
+    try:
+        return literal_eval(arg)
+    except (ValueError, SyntaxError):
+        return arg
+
+
+def printlist(items):
+    """Print the items of an iterable the way print() prints a list
+    of them, without building the list."""
+    print("[", end="")
+    for i, item in enumerate(items):
+        print(repr(item) if i == 0 else ", " + repr(item), end="")
+    print("]")
+
+
+def interned(name, value):
+    """Return value interned by storage if name is a foreign key, one
+    ending in _id or _ids, as storage does on reload."""
+    if name.endswith("_id"):
+        return storage.intern(value)
+    if name.endswith("_ids") and type(value) is list:
+        return [storage.intern(i) for i in value]
+    return value
+
+
+def settable(name):
+    """Return True if update may set the attribute name: not a dunder,
+    nor the id or timestamps every instance is built with."""
+    return (not name.startswith("__") and
+            name not in ("id", "created_at", "updated_at"))
+
+
 class HBNBCommand(cmd.Cmd):
     """Defines the HolbertonBnB command interpreter.
 
@@ -39,15 +71,6 @@ class HBNBCommand(cmd.Cmd):
     """
 
     prompt = "(hbnb) "
-    __classes = {
-        "BaseModel",
-        "User",
-        "State",
-        "City",
-        "Place",
-        "Amenity",
-        "Review"
-    }
 
     def emptyline(self):
         pass
@@ -58,7 +81,8 @@ class HBNBCommand(cmd.Cmd):
             "show": self.do_show,
             "destroy": self.do_destroy,
             "count": self.do_count,
-            "update": self.do_update
+            "update": self.do_update,
+            "where": self.do_where
         }
         match = re.search(r"\.", arg)
         if match is not None:
@@ -86,71 +110,205 @@ class HBNBCommand(cmd.Cmd):
         argl = parse(arg)
         if len(argl) == 0:
             print("** class name missing **")
-        elif argl[0] not in HBNBCommand.__classes:
+        elif argl[0] not in registry:
             print("** class doesn't exist **")
         else:
-            print(eval(argl[0])().id)
+            print(registry[argl[0]]().id)
             storage.save()
 
+    def do_create_many(self, arg):
+        """Usage: create_many <class> <count> or create_many <class> <file>
+        Create instances in bulk, saved once, and print their ids.
+        A file holds one JSON dictionary of attributes per line; none
+        is created if a line is invalid or sets an id already used."""
+        argl = parse(arg)
+        if len(argl) == 0:
+            print("** class name missing **")
+            return False
+        if argl[0] not in registry:
+            print("** class doesn't exist **")
+            return False
+        if len(argl) == 1:
+            print("** count or file missing **")
+            return False
+        numbers = None
+        if argl[1].isdigit():
+            rows = ({} for i in range(int(argl[1])))
+        else:
+            try:
+                with open(argl[1]) as f:
+                    lines = [(n, line) for n, line in enumerate(f, 1)
+                             if line.strip()]
+            except OSError:
+                print("** file doesn't exist **")
+                return False
+            rows = []
+            for n, line in lines:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                if not isinstance(row, dict):
+                    print("** invalid attributes on line {} **".format(n))
+                    return False
+                rows.append(row)
+            numbers = [n for n, line in lines]
+        try:
+            objs = storage.bulk_create(argl[0], rows)
+        except ValueError as err:
+            n = err.args[1]
+            print("** invalid attributes on line {} **".format(
+                numbers[n] if numbers else n + 1))
+            return False
+        if objs:
+            print("\n".join(obj.id for obj in objs))
+
     def do_show(self, arg):
         """Usage: show <class> <id> or <class>.show(<id>)
         Display the string representation of a class instance of a given id.
         """
         argl = parse(arg)
-        objdict = storage.all()
         if len(argl) == 0:
             print("** class name missing **")
-        elif argl[0] not in HBNBCommand.__classes:
+        elif argl[0] not in registry:
             print("** class doesn't exist **")
         elif len(argl) == 1:
             print("** instance id missing **")
-        elif "{}.{}".format(argl[0], argl[1]) not in objdict:
+        elif storage.get(argl[0], argl[1]) is None:
             print("** no instance found **")
         else:
-            print(objdict["{}.{}".format(argl[0], argl[1])])
+            print(storage.get(argl[0], argl[1]))
 
     def do_destroy(self, arg):
         """Usage: destroy <class> <id> or <class>.destroy(<id>)
         Delete a class instance of a given id."""
         argl = parse(arg)
-        objdict = storage.all()
         if len(argl) == 0:
             print("** class name missing **")
-        elif argl[0] not in HBNBCommand.__classes:
+        elif argl[0] not in registry:
             print("** class doesn't exist **")
         elif len(argl) == 1:
             print("** instance id missing **")
-        elif "{}.{}".format(argl[0], argl[1]) not in objdict.keys():
+        elif storage.get(argl[0], argl[1]) is None:
             print("** no instance found **")
         else:
-            del objdict["{}.{}".format(argl[0], argl[1])]
+            storage.delete(storage.get(argl[0], argl[1]))
             storage.save()
 
     def do_all(self, arg):
         """Usage: all or all <class> or <class>.all()
         Display string representations of all instances of a given class.
-        If no class is specified, displays all instantiated objects."""
+        If no class is specified, displays all instantiated objects.
+        With [--limit <count>] [--after <cursor>], displays one page of
+        them ordered by key, then the cursor of the next page if any."""
         argl = parse(arg)
-        if len(argl) > 0 and argl[0] not in HBNBCommand.__classes:
-            print("** class doesn't exist **")
-        else:
-            objl = []
-            for obj in storage.all().values():
-                if len(argl) > 0 and argl[0] == obj.__class__.__name__:
-                    objl.append(obj.__str__())
-                elif len(argl) == 0:
-                    objl.append(obj.__str__())
-            print(objl)
+        name = None
+        if len(argl) > 0 and not argl[0].startswith("--"):
+            name = argl.pop(0)
+            if name not in registry:
+                print("** class doesn't exist **")
+                return False
+        limit = after = None
+        args = iter(argl)
+        for opt in args:
+            if opt not in ("--limit", "--after"):
+                continue
+            value = next(args, "")
+            if opt == "--limit" and value.isdigit() and int(value) > 0:
+                limit = int(value)
+            elif opt == "--after" and value:
+                after = value
+            else:
+                print("** invalid {} value **".format(opt))
+                return False
+        if limit is None and after is None:
+            objdict = storage.all(name) if name else storage.all()
+            printlist(obj.__str__() for obj in objdict.values())
+            return False
+        try:
+            objs, cursor = storage.page(name, limit or 100, after)
+        except ValueError:
+            print("** invalid cursor **")
+            return False
+        printlist(obj.__str__() for obj in objs)
+        if cursor is not None:
+            print("next: {}".format(cursor))
 
     def do_count(self, arg):
         """Usage: count <class> or <class>.count()
         Retrieve the number of instances of a given class."""
         argl = parse(arg)
-        count = 0
-        for obj in storage.all().values():
-            if argl[0] == obj.__class__.__name__:
-                count += 1
-        print(count)
+        print(len(storage.all(argl[0])))
+
+    def do_where(self, arg):
+        """Usage: where <class> [<attribute>[__<lookup>]=<value> ...]
+       [--only <attribute>,...] [--limit <count>] or
+       <class>.where(<attribute>[__<lookup>]=<value>, ...)
+        Display the instances of a class matching every condition.
+        Lookups are eq, ne, lt, lte, gt, gte, contains and in, whose
+        values are separated by commas."""
+        argl = [i.strip(",") for i in split(arg)]
+        if len(argl) == 0:
+            print("** class name missing **")
+            return False
+        if argl[0] not in registry:
+            print("** class doesn't exist **")
+            return False
+        query = storage.query(argl[0])
+        defaults = declared(registry[argl[0]])
+        fields = None
+        args = iter(argl[1:])
+        for cond in args:
+            if cond in ("--only", "--limit"):
+                value = next(args, "")
+                if cond == "--only" and value:
+                    fields = value.split(",")
+                    query = query.only(*fields)
+                elif cond == "--limit" and value.isdigit():
+                    query = query.limit(int(value))
+                else:
+                    print("** invalid {} value **".format(cond))
+                    return False
+                continue
+            key, sep, value = cond.partition("=")
+            attr, lookup = condition(key)
+            if not sep or not attr:
+                print("** invalid condition: {} **".format(cond))
+                return False
+            valtype = type(defaults.get(attr))
+            values = value.split(",") if lookup == "in" else [value]
+            try:
+                if valtype in {str, int, float}:
+                    values = [valtype(v) for v in values]
+                else:
+                    values = [literal(v) for v in values]
+            except ValueError:
+                print("** invalid value for {} **".format(attr))
+                return False
+            query = query.where(**{key: values if lookup == "in" else
+                                   values[0]})
+        printlist(query if fields is not None else
+                  (obj.__str__() for obj in query))
+
+    def do_begin(self, arg):
+        """Usage: begin
+        Start a transaction: changes are only saved on commit."""
+        if storage.in_transaction():
+            print("** transaction already in progress **")
+        else:
+            storage.begin()
+
+    def do_commit(self, arg):
+        """Usage: commit
+        Save every change made since begin in a single write."""
+        if not storage.commit():
+            print("** no transaction in progress **")
+
+    def do_rollback(self, arg):
+        """Usage: rollback
+        Discard every change made since begin."""
+        if not storage.rollback():
+            print("** no transaction in progress **")
 
     def do_update(self, arg):
         """Usage: update <class> <id> <attribute_name> <attribute_value> or
@@ -159,18 +317,18 @@ class HBNBCommand(cmd.Cmd):
         Update a class instance of a given id by adding or updating
         a given attribute key/value pair or dictionary."""
         argl = parse(arg)
-        objdict = storage.all()
 
         if len(argl) == 0:
             print("** class name missing **")
             return False
-        if argl[0] not in HBNBCommand.__classes:
+        if argl[0] not in registry:
             print("** class doesn't exist **")
             return False
         if len(argl) == 1:
             print("** instance id missing **")
             return False
-        if "{}.{}".format(argl[0], argl[1]) not in objdict.keys():
+        obj = storage.get(argl[0], argl[1])
+        if obj is None:
             print("** no instance found **")
             return False
         if len(argl) == 2:
@@ -178,27 +336,34 @@ class HBNBCommand(cmd.Cmd):
             return False
         if len(argl) == 3:
             try:
-                type(eval(argl[2])) != dict
-            except NameError:
+                attrs = literal_eval(argl[2])
+            except (ValueError, SyntaxError):
+                attrs = None
+            if not isinstance(attrs, dict):
                 print("** value missing **")
                 return False
 
-        if len(argl) == 4:
-            obj = objdict["{}.{}".format(argl[0], argl[1])]
-            if argl[2] in obj.__class__.__dict__.keys():
-                valtype = type(obj.__class__.__dict__[argl[2]])
-                obj.__dict__[argl[2]] = valtype(argl[3])
+        names = [argl[2]] if len(argl) > 3 else list(attrs)
+        for name in names:
+            if not isinstance(name, str) or not settable(name):
+                print("** attribute can't be updated: {} **".format(name))
+                return False
+
+        defaults = declared(obj.__class__)
+        if len(argl) > 3:
+            if argl[2] in defaults:
+                valtype = type(defaults[argl[2]])
+                setattr(obj, argl[2], interned(argl[2], valtype(argl[3])))
             else:
-                obj.__dict__[argl[2]] = argl[3]
-        elif type(eval(argl[2])) == dict:
-            obj = objdict["{}.{}".format(argl[0], argl[1])]
-            for k, v in eval(argl[2]).items():
-                if (k in obj.__class__.__dict__.keys() and
-                        type(obj.__class__.__dict__[k]) in {str, int, float}):
-                    valtype = type(obj.__class__.__dict__[k])
-                    obj.__dict__[k] = valtype(v)
+                setattr(obj, argl[2], interned(argl[2], argl[3]))
+        else:
+            for k, v in attrs.items():
+                if (k in defaults and
+                        type(defaults[k]) in {str, int, float}):
+                    valtype = type(defaults[k])
+                    setattr(obj, k, interned(k, valtype(v)))
                 else:
-                    obj.__dict__[k] = v
+                    setattr(obj, k, interned(k, v))
         storage.save()
 
 
@@ -1,11 +1,278 @@
 #!/usr/bin/python3
 """Defining the BaseModel classes"""
 import models
-from uuid import uuid4
+from collections.abc import MutableMapping
+from itertools import islice
+from os import getenv, urandom
+from uuid import UUID, uuid4
 from datetime import datetime
 
+compact = getenv("HBNB_COMPACT_MODELS") == "1"
+registry = {}
 
-class BaseModel:
+
+def declared(cls):
+    """Return the attributes declared on a model class and their
+    defaults, inherited ones first.
+
+    These are its public class attributes holding a str, int, float
+    or list, e.g. {"state_id": "", "name": ""} for City.
+    """
+    return getattr(cls, "_defaults", {})
+
+
+def instances(cls, rows, batch=1024):
+    """Yield a new instance of a model class for every row.
+
+    Instances are built as from keyword arguments, so they are not
+    added to storage. Their ids are drawn batch at a time and they
+    share one created_at/updated_at time, unless a row sets them.
+
+    Args:
+        cls (type): The model class.
+        rows (iterable): A dict of attributes per instance.
+        batch (int): The number of ids drawn at a time.
+
+    Raises:
+        ValueError: If a row sets an id that is not a non-empty string
+            or a timestamp that is not a datetime or ISO format string.
+            Its args are a message and the index of the row.
+    """
+    now = datetime.today()
+    rows = iter(rows)
+    n = 0
+    while True:
+        chunk = list(islice(rows, batch))
+        if not chunk:
+            return
+        rand = urandom(16 * len(chunk))
+        for i, row in enumerate(chunk):
+            kwargs = {"id": str(UUID(bytes=rand[16 * i:16 * i + 16],
+                                     version=4)),
+                      "created_at": now, "updated_at": now}
+            kwargs.update(row)
+            kwargs.pop("__class__", None)
+            try:
+                obj = cls(**kwargs)
+            except (TypeError, ValueError):
+                obj = None
+            if obj is None or type(obj.id) is not str or not obj.id:
+                raise ValueError("invalid attributes in row {}".format(n),
+                                 n)
+            yield obj
+            n += 1
+
+
+class Slot:
+    """A declared attribute stored in a slot.
+
+    It reads as the class default on the class and on instances where
+    it is unset, as a plain class attribute would.
+
+    Attributes:
+        member (member_descriptor): The slot the value is stored in.
+        default (any): The declared default.
+    """
+
+    __slots__ = ("member", "default")
+
+    def __init__(self, member, default):
+        """Initialize a new Slot wrapping member."""
+        self.member = member
+        self.default = default
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self.default
+        try:
+            return self.member.__get__(obj, cls)
+        except AttributeError:
+            return self.default
+
+    def __set__(self, obj, value):
+        self.member.__set__(obj, value)
+
+    def __delete__(self, obj):
+        self.member.__delete__(obj)
+
+
+class AttrView(MutableMapping):
+    """A live, dict-like view of the attributes of a compact model.
+
+    It is what __dict__ returns in compact mode: set slots come first,
+    in declaration order, then the extra attributes. Writing through it
+    bypasses __setattr__, as writing to a real __dict__ does.
+    """
+
+    __slots__ = ("_obj",)
+
+    def __init__(self, obj):
+        """Initialize a view of the attributes of obj."""
+        self._obj = obj
+
+    def __extras(self, create=False):
+        """Return the extras dict of the object, or None if it has none
+        and create is not set."""
+        try:
+            return object.__getattribute__(self._obj, "_extras")
+        except AttributeError:
+            if not create:
+                return None
+        extras = {}
+        object.__setattr__(self._obj, "_extras", extras)
+        return extras
+
+    def __getitem__(self, key):
+        member = type(self._obj)._members.get(key)
+        if member is not None:
+            try:
+                return member.__get__(self._obj)
+            except AttributeError:
+                raise KeyError(key) from None
+        extras = self.__extras()
+        if extras is None or key not in extras:
+            raise KeyError(key)
+        return extras[key]
+
+    def __setitem__(self, key, value):
+        member = type(self._obj)._members.get(key)
+        if member is not None:
+            member.__set__(self._obj, value)
+        else:
+            self.__extras(True)[key] = value
+
+    def __delitem__(self, key):
+        member = type(self._obj)._members.get(key)
+        if member is not None:
+            try:
+                member.__delete__(self._obj)
+            except AttributeError:
+                raise KeyError(key) from None
+        else:
+            extras = self.__extras()
+            if extras is None or key not in extras:
+                raise KeyError(key)
+            del extras[key]
+
+    def __iter__(self):
+        obj = self._obj
+        for key, member in type(obj)._members.items():
+            try:
+                member.__get__(obj)
+            except AttributeError:
+                continue
+            yield key
+        extras = self.__extras()
+        if extras is not None:
+            yield from list(extras)
+
+    def __len__(self):
+        return sum(1 for key in self)
+
+    def copy(self):
+        """Return the attributes as a plain dict, reading each slot
+        once."""
+        obj = self._obj
+        attrs = {}
+        for key, member in type(obj)._members.items():
+            try:
+                attrs[key] = member.__get__(obj)
+            except AttributeError:
+                pass
+        extras = self.__extras()
+        if extras:
+            attrs.update(extras)
+        return attrs
+
+    def __repr__(self):
+        return repr(self.copy())
+
+
+class Compact:
+    """Slot-based attribute storage for the model classes.
+
+    Declared attributes live in slots (see Slot), as do id, created_at
+    and updated_at; any other attribute goes to an _extras dict created
+    on first use. __dict__ is an AttrView over both.
+    """
+
+    __slots__ = ()
+
+    @property
+    def __dict__(self):
+        """Return a live view of the attributes."""
+        return AttrView(self)
+
+    def __getattr__(self, name):
+        if name != "_extras":
+            extras = getattr(self, "_extras", None)
+            if extras is not None and name in extras:
+                return extras[name]
+        raise AttributeError("{!r} object has no attribute {!r}".format(
+            type(self).__name__, name))
+
+    def __setattr__(self, name, value):
+        self.__dict__[name] = value
+
+    def __delattr__(self, name):
+        try:
+            del self.__dict__[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __getstate__(self):
+        return self.__dict__.copy()
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+
+class ModelMeta(type):
+    """The metaclass of the model classes.
+
+    It records the declared attributes of every class in _defaults,
+    and registers the class by name in registry, where storage and the
+    console look model classes up: a model defined anywhere is known to
+    them once its module is imported.
+    With HBNB_COMPACT_MODELS=1 they are stored in __slots__ instead,
+    wrapped in Slot, and the root class gets Compact storage, so that
+    instances carry no per-instance __dict__. _members then maps the
+    name of every slotted attribute to its member descriptor.
+    """
+
+    def __new__(mcs, name, bases, ns):
+        defaults = {}
+        for base in reversed(bases):
+            defaults.update(declared(base))
+        own = {k: v for k, v in ns.items() if not k.startswith("_") and
+               type(v) in (str, int, float, list)}
+        defaults.update(own)
+        ns["_defaults"] = defaults
+        if compact:
+            for k in own:
+                del ns[k]
+            members = {}
+            for base in bases:
+                members.update(getattr(base, "_members", {}))
+            slots = ()
+            if not any(isinstance(base, ModelMeta) for base in bases):
+                bases = (Compact,) + bases
+                slots = ("id", "created_at", "updated_at", "_extras",
+                         "__weakref__")
+            new = tuple(k for k in own if k not in members)
+            ns["__slots__"] = slots + new
+        cls = super().__new__(mcs, name, bases, ns)
+        if compact:
+            for k in slots[:3] + new:
+                members[k] = vars(cls)[k]
+            for k in own:
+                setattr(cls, k, Slot(members[k], own[k]))
+            cls._members = members
+        registry[name] = cls
+        return cls
+
+
+class BaseModel(metaclass=ModelMeta):
     """Representing the BaseModel of the HBnB class"""
 
     def __init__(self, *args, **kwargs):
@@ -14,22 +281,35 @@ class BaseModel:
         Args:
             *args (any): Unused.
             **kwargs (dict): Key/value pairs of attributes.
+                created_at and updated_at may be datetimes or strings
+                as returned by datetime.isoformat().
         """
-        tform = "%Y-%m-%dT%H:%M:%S.%f"
-        self.id = str(uuid4())
-        self.created_at = datetime.today()
-        self.updated_at = datetime.today()
-        if len(kwargs) != 0:
-            for k, v in kwargs.items():
-                if k == "created_at" or k == "updated_at":
-                    self.__dict__[k] = datetime.strptime(v, tform)
-                else:
-                    self.__dict__[k] = v
-        else:
+        if len(kwargs) == 0:
+            self.id = str(uuid4())
+            self.created_at = datetime.today()
+            self.updated_at = datetime.today()
             models.storage.new(self)
+            return
+        attrs = self.__dict__
+        if "id" not in kwargs:
+            attrs["id"] = str(uuid4())
+        for k in ("created_at", "updated_at"):
+            if k not in kwargs:
+                attrs[k] = datetime.today()
+        for k, v in kwargs.items():
+            if k == "created_at" or k == "updated_at":
+                if not isinstance(v, datetime):
+                    v = datetime.fromisoformat(v)
+            attrs[k] = v
+
+    def __setattr__(self, name, value):
+        """Set an attribute and flag the instance as changed in storage."""
+        models.storage.mark_dirty(self)
+        super().__setattr__(name, value)
 
     def save(self):
         self.updated_at = datetime.today()
+        models.storage.mark_dirty(self)
         models.storage.save()
 
     def to_dict(self):
@@ -0,0 +1,258 @@
+#!/usr/bin/python3
+"""Defining the binary codec for FileStorage.
+
+A binary file starts with MAGIC followed by frames, each a uint32
+length and that many bytes. A frame is either a class schema or an
+object record:
+
+    schema: SCHEMA, class name, field count, field names
+    object: OBJECT, schema index, a value per field, extra count,
+            then a (name, value) pair per undeclared attribute
+
+The fields of a schema are id, created_at, updated_at and the
+attributes declared on the model class. Every value starts with a
+one-byte tag. Strings go through a table shared by the whole file:
+the first occurrence is written inline and appended to the table,
+later ones are written as an index into it. created_at and updated_at
+are packed as microseconds since the epoch. All integers are
+little-endian.
+"""
+import json
+import struct
+from datetime import datetime, timedelta
+from models.base_model import declared
+
+MAGIC = b"HBNB\x01"
+SCHEMA = 1
+OBJECT = 2
+
+MISSING = 0
+NEWSTR = 1
+STRREF = 2
+INT = 3
+FLOAT = 4
+TIME = 5
+JSON = 6
+
+EPOCH = datetime(1970, 1, 1)
+MICRO = timedelta(microseconds=1)
+TIMES = ("created_at", "updated_at")
+
+_frame = struct.Struct("<I")
+_tag = struct.Struct("<B")
+_int = struct.Struct("<q")
+_float = struct.Struct("<d")
+_missing = object()
+
+
+def schema(cls):
+    """Return the field names of the records of a model class."""
+    fields = ["id", "created_at", "updated_at"]
+    return fields + [k for k in declared(cls) if k not in fields]
+
+
+class Encoder:
+    """Writes to_dict() records to a binary file.
+
+    Attributes:
+        __f (file): The binary file written to.
+        __classes (dict): The model classes, by name.
+        __schemas (dict): The (index, fields) schema written per class.
+        __strings (dict): The index in the string table of each string.
+    """
+
+    def __init__(self, f, classes):
+        """Initialize a new Encoder and write the file header.
+
+        Args:
+            f (file): A file opened for binary writing.
+            classes (dict): The model classes, by name.
+        """
+        self.__f = f
+        self.__classes = classes
+        self.__schemas = {}
+        self.__strings = {}
+        f.write(MAGIC)
+
+    def write(self, rec):
+        """Encode one record as returned by BaseModel.to_dict()."""
+        name = rec["__class__"]
+        if name not in self.__schemas:
+            cls = self.__classes.get(name)
+            fields = schema(cls) if cls is not None else schema(object)
+            self.__schemas[name] = (len(self.__schemas), fields)
+            buf = bytearray(_tag.pack(SCHEMA))
+            self.__raw(buf, name)
+            buf += _frame.pack(len(fields))
+            for field in fields:
+                self.__raw(buf, field)
+            self.__flush(buf)
+        index, fields = self.__schemas[name]
+        buf = bytearray(_tag.pack(OBJECT))
+        buf += _frame.pack(index)
+        for field in fields:
+            self.__value(buf, rec.get(field, _missing), field in TIMES)
+        extras = [k for k in rec if k not in fields and k != "__class__"]
+        buf += _frame.pack(len(extras))
+        for k in extras:
+            self.__value(buf, k)
+            self.__value(buf, rec[k])
+        self.__flush(buf)
+
+    def __flush(self, buf):
+        """Write buf as one frame."""
+        self.__f.write(_frame.pack(len(buf)))
+        self.__f.write(buf)
+
+    def __raw(self, buf, s):
+        """Append a length-prefixed UTF-8 string to buf."""
+        data = s.encode("utf-8")
+        buf += _frame.pack(len(data))
+        buf += data
+
+    def __value(self, buf, v, time=False):
+        """Append a tagged value to buf.
+
+        With time set, ISO 8601 strings and naive datetimes are packed
+        as timestamps; anything else is written as usual.
+        """
+        if time and isinstance(v, str):
+            try:
+                v = datetime.fromisoformat(v)
+            except ValueError:
+                pass
+        if v is _missing:
+            buf += _tag.pack(MISSING)
+        elif time and isinstance(v, datetime) and v.tzinfo is None:
+            buf += _tag.pack(TIME)
+            buf += _int.pack((v - EPOCH) // MICRO)
+        elif isinstance(v, datetime):
+            self.__value(buf, v.isoformat())
+        elif type(v) is str:
+            index = self.__strings.get(v)
+            if index is None:
+                self.__strings[v] = len(self.__strings)
+                buf += _tag.pack(NEWSTR)
+                self.__raw(buf, v)
+            else:
+                buf += _tag.pack(STRREF)
+                buf += _frame.pack(index)
+        elif type(v) is int and -2 ** 63 <= v < 2 ** 63:
+            buf += _tag.pack(INT)
+            buf += _int.pack(v)
+        elif type(v) is float:
+            buf += _tag.pack(FLOAT)
+            buf += _float.pack(v)
+        else:
+            buf += _tag.pack(JSON)
+            self.__raw(buf, json.dumps(v))
+
+
+def load(f):
+    """Yield the records of a binary file one at a time.
+
+    Records are dicts shaped like BaseModel.to_dict() output, except
+    that created_at and updated_at are datetime objects.
+
+    Args:
+        f (file): A file opened for binary reading.
+    """
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("not an HBNB binary file")
+    schemas = []
+    strings = []
+
+    def raw(buf, pos):
+        n, = _frame.unpack_from(buf, pos)
+        pos += 4
+        return buf[pos:pos + n].decode("utf-8"), pos + n
+
+    def value(buf, pos):
+        tag = buf[pos]
+        pos += 1
+        if tag == STRREF:
+            i, = _frame.unpack_from(buf, pos)
+            return strings[i], pos + 4
+        if tag == NEWSTR:
+            s, pos = raw(buf, pos)
+            strings.append(s)
+            return s, pos
+        if tag == TIME:
+            n, = _int.unpack_from(buf, pos)
+            return EPOCH + n * MICRO, pos + 8
+        if tag == INT:
+            return _int.unpack_from(buf, pos)[0], pos + 8
+        if tag == FLOAT:
+            return _float.unpack_from(buf, pos)[0], pos + 8
+        if tag == JSON:
+            s, pos = raw(buf, pos)
+            return json.loads(s), pos
+        return _missing, pos
+
+    while True:
+        head = f.read(4)
+        if len(head) < 4:
+            return
+        n, = _frame.unpack(head)
+        buf = f.read(n)
+        if len(buf) < n:
+            return
+        if buf[0] == SCHEMA:
+            name, pos = raw(buf, 1)
+            count, = _frame.unpack_from(buf, pos)
+            pos += 4
+            fields = []
+            for i in range(count):
+                field, pos = raw(buf, pos)
+                fields.append(field)
+            schemas.append((name, fields))
+            continue
+        index, = _frame.unpack_from(buf, 1)
+        name, fields = schemas[index]
+        pos = 5
+        rec = {}
+        for field in fields:
+            v, pos = value(buf, pos)
+            if v is not _missing:
+                rec[field] = v
+        count, = _frame.unpack_from(buf, pos)
+        pos += 4
+        for i in range(count):
+            k, pos = value(buf, pos)
+            rec[k], pos = value(buf, pos)
+        rec["__class__"] = name
+        yield rec
+
+
+def json_to_binary(src, dst, classes):
+    """Convert a JSON storage file into the binary format.
+
+    Args:
+        src (str): The path of the JSON file to read.
+        dst (str): The path of the binary file to write.
+        classes (dict): The model classes, by name.
+    """
+    with open(src) as f:
+        objdict = json.load(f)
+    with open(dst, "wb") as f:
+        enc = Encoder(f, classes)
+        for rec in objdict.values():
+            enc.write(rec)
+
+
+def binary_to_json(src, dst):
+    """Convert a binary storage file into the JSON format.
+
+    Args:
+        src (str): The path of the binary file to read.
+        dst (str): The path of the JSON file to write.
+    """
+    objdict = {}
+    with open(src, "rb") as f:
+        for rec in load(f):
+            for k in TIMES:
+                if isinstance(rec.get(k), datetime):
+                    rec[k] = rec[k].isoformat()
+            objdict["{}.{}".format(rec["__class__"], rec["id"])] = rec
+    with open(dst, "w") as f:
+        json.dump(objdict, f)
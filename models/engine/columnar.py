@@ -0,0 +1,163 @@
+#!/usr/bin/python3
+"""Defining the Columns class, a columnar view of numeric attributes."""
+import operator
+from array import array
+from math import isnan
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+ops = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge
+}
+typecodes = {int: "q", float: "d"}
+
+
+class Columns:
+    """Represents the numeric attributes of the objects of one class,
+    as one typed array per attribute.
+
+    Row i of every column holds the values of the object stored under
+    keys[i]. Int attributes are kept as int64 ("q") and float ones as
+    doubles ("d"); a value that cannot be converted is stored as 0 or
+    NaN respectively. Filters and aggregates run on NumPy views of the
+    columns when NumPy is installed, and in plain Python otherwise.
+
+    Attributes:
+        keys (list): The <class>.<id> key of each row.
+        fields (dict): The type of each column, by attribute name.
+        __rows (dict): The row of each key.
+        __cols (dict): The array.array of each column.
+    """
+
+    def __init__(self, fields):
+        """Initialize an empty set of columns.
+
+        Args:
+            fields (dict): The attribute names and their int or float
+                types, e.g. {"max_guest": int, "latitude": float}.
+        """
+        self.keys = []
+        self.fields = {k: t for k, t in fields.items() if t in typecodes}
+        self.__rows = {}
+        self.__cols = {k: array(typecodes[t]) for k, t in
+                       self.fields.items()}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __value(self, field, value):
+        """Convert value to the type of a column."""
+        try:
+            return self.fields[field](value)
+        except (TypeError, ValueError, OverflowError):
+            return 0 if self.fields[field] is int else float("nan")
+
+    def set(self, key, obj):
+        """Add or update the row of obj, stored under key."""
+        row = self.__rows.get(key)
+        if row is None:
+            self.__rows[key] = len(self.keys)
+            self.keys.append(key)
+            for field, col in self.__cols.items():
+                col.append(self.__value(field, getattr(obj, field, None)))
+        else:
+            for field, col in self.__cols.items():
+                col[row] = self.__value(field, getattr(obj, field, None))
+
+    def discard(self, key):
+        """Remove the row of key if there is one.
+
+        The last row is moved into its place.
+        """
+        row = self.__rows.pop(key, None)
+        if row is None:
+            return
+        last = self.keys.pop()
+        for col in self.__cols.values():
+            value = col.pop()
+            if last != key:
+                col[row] = value
+        if last != key:
+            self.keys[row] = last
+            self.__rows[last] = row
+
+    def column(self, field):
+        """Return the array.array of a column.
+
+        It must not be modified, nor resized through a buffer kept
+        past the next change to storage.
+        """
+        return self.__cols[field]
+
+    def mask(self, where=()):
+        """Return which rows match every (field, op, value) condition.
+
+        Args:
+            where (iterable): Conditions such as ("max_guest", ">=", 4),
+                where op is a key of ops.
+
+        Returns:
+            A NumPy bool array if NumPy is installed, else a list.
+        """
+        if numpy is not None:
+            mask = numpy.ones(len(self.keys), dtype=bool)
+            for field, op, value in where:
+                mask &= ops[op](numpy.frombuffer(self.__cols[field],
+                                                 self.__cols[field].typecode),
+                                value)
+            return mask
+        mask = [True] * len(self.keys)
+        for field, op, value in where:
+            test = ops[op]
+            mask = [m and test(v, value) for m, v in
+                    zip(mask, self.__cols[field])]
+        return mask
+
+    def select(self, where=()):
+        """Return the keys of the rows matching where, in row order."""
+        return [k for k, m in zip(self.keys, self.mask(where)) if m]
+
+    def aggregate(self, func, field=None, where=()):
+        """Compute an aggregate over the rows matching where.
+
+        NaN values are left out of sum, mean, min and max.
+
+        Args:
+            func (str): "count", "sum", "mean", "min" or "max".
+            field (str): The column aggregated; unused for "count".
+            where (iterable): Conditions, as for mask().
+
+        Returns:
+            The result, or None for mean, min and max over no value.
+        """
+        mask = self.mask(where)
+        if func == "count":
+            if numpy is not None:
+                return int(numpy.count_nonzero(mask))
+            return sum(mask)
+        col = self.__cols[field]
+        if numpy is not None:
+            values = numpy.frombuffer(col, col.typecode)[mask]
+            if col.typecode == "d":
+                values = values[~numpy.isnan(values)]
+            if func == "sum":
+                return values.sum().item()
+            if len(values) == 0:
+                return None
+            return getattr(values, func)().item()
+        values = [v for v, m in zip(col, mask) if m and
+                  not (col.typecode == "d" and isnan(v))]
+        if func == "sum":
+            return sum(values)
+        if not values:
+            return None
+        if func == "mean":
+            return sum(values) / len(values)
+        return {"min": min, "max": max}[func](values)
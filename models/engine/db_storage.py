@@ -0,0 +1,447 @@
+#!/usr/bin/python3
+"""Defining the DBStorage class"""
+import json
+import sqlite3
+from contextlib import contextmanager
+from os import getenv
+from models.base_model import BaseModel, declared, instances, registry
+from models.engine.query import Query, decode_cursor, page_keys
+from models.user import User
+from models.state import State
+from models.city import City
+from models.place import Place
+from models.amenity import Amenity
+from models.review import Review
+
+# Every model class by name, the ones imported above included.
+classes = registry
+sqltypes = {str: "TEXT", int: "INTEGER", float: "REAL", list: "TEXT"}
+
+
+def columns(cls):
+    """Return the declared attributes of a model class and their types.
+
+    e.g. {"state_id": str, "name": str} for City; see declared().
+    """
+    return {k: type(v) for k, v in declared(cls).items()
+            if type(v) in sqltypes}
+
+
+class DBStorage:
+    """Represents a SQLite storage engine
+
+    Every model class gets its own table holding one column per
+    declared attribute plus id, created_at and updated_at. Attributes
+    that are not declared on the class are kept as JSON in __extra__.
+    Foreign-key columns (ending in _id) are indexed.
+
+    Attributes:
+        __db_path (str): The path of the SQLite database file.
+        __conn (sqlite3.Connection): The open database connection.
+        __objects (dict): The objects loaded or created so far.
+        __by_class (dict): __objects partitioned by class name.
+        __dirty (set): The keys changed since the last save.
+        __loaded (set): The tables that have been read in full.
+        __tables (set): The tables created or checked since the last
+            reload.
+        __depth (int): The nesting depth of the open transaction.
+        __touched (set): The keys changed in the open transaction.
+        __interned (dict): The canonical copy of each foreign-key value
+            read since the last reload.
+    """
+
+    def __init__(self):
+        """Initialize a new DBStorage."""
+        self.__db_path = getenv("HBNB_DB_PATH", "hbnb.db")
+        self.__conn = None
+        self.__objects = {}
+        self.__by_class = {}
+        self.__dirty = set()
+        self.__loaded = set()
+        self.__tables = set()
+        self.__depth = 0
+        self.__touched = set()
+        self.__interned = {}
+
+    def all(self, cls=None):
+        """Return the dictionary of stored objects, by <class>.<id>.
+
+        Args:
+            cls (type or str): If given, only return the objects of this
+                class (or class name). The partition is returned as is
+                and must not be modified.
+        """
+        if cls is None:
+            for name in classes:
+                self.__load(name)
+            return self.__objects
+        name = cls if isinstance(cls, str) else cls.__name__
+        self.__load(name)
+        return self.__by_class.get(name, {})
+
+    def __load(self, name):
+        """Read every row of the table of a class not yet in memory."""
+        if name in self.__loaded or not self.__table(name):
+            return
+        cur = self.__conn.execute('SELECT * FROM "{}"'.format(name))
+        for row in cur:
+            key = "{}.{}".format(name, row[0])
+            if key not in self.__objects and key not in self.__dirty:
+                self.__store(key, self.__build(classes[name], cur, row))
+        self.__loaded.add(name)
+
+    def __store(self, key, obj):
+        """Put obj in __objects and its class partition."""
+        self.__objects[key] = obj
+        self.__by_class.setdefault(obj.__class__.__name__, {})[key] = obj
+
+    def by_attr(self, cls, attr, value):
+        """Return the objects of a class whose attribute equals value.
+
+        Declared attributes are looked up in the class table, through
+        its index for the foreign-key columns; unsaved changes are
+        taken into account.
+
+        Args:
+            cls (type or str): The model class or its name.
+            attr (str): The attribute name, e.g. "state_id".
+            value (any): The value to match.
+        """
+        name = cls if isinstance(cls, str) else cls.__name__
+        if not self.__table(name):
+            return {}
+        if name in self.__loaded or attr not in columns(classes[name]):
+            return {k: o for k, o in self.all(name).items()
+                    if getattr(o, attr, None) == value}
+        cur = self.__conn.execute('SELECT * FROM "{}" WHERE {} = ?'
+                                  .format(name, attr), (value,))
+        for row in cur:
+            key = "{}.{}".format(name, row[0])
+            if key not in self.__objects and key not in self.__dirty:
+                self.__store(key, self.__build(classes[name], cur, row))
+        return {k: o for k, o in self.__by_class.get(name, {}).items()
+                if getattr(o, attr, None) == value}
+
+    def indexed(self, cls):
+        """Return the attributes of a class whose column is indexed:
+        its declared foreign keys."""
+        name = cls if isinstance(cls, str) else cls.__name__
+        return tuple(k for k in columns(classes.get(name))
+                     if k.endswith("_id"))
+
+    def query(self, cls):
+        """Return a Query over the objects of a class.
+
+        Args:
+            cls (type or str): The model class or its name.
+        """
+        return Query(self, cls)
+
+    def page(self, cls=None, limit=100, after=None):
+        """Return a page of stored objects, ordered by key.
+
+        Each table is read through its primary key, at most a page of
+        rows at a time, and merged with the unsaved changes.
+
+        Args:
+            cls (type or str): If given, only list the objects of this
+                class (or class name).
+            limit (int): The page size.
+            after (str): The cursor returned with the previous page, or
+                None for the first page.
+
+        Returns:
+            The list of objects on the page and the cursor of the next
+            page, or None if it is the last one.
+
+        Raises:
+            ValueError: If the cursor or page size is invalid.
+        """
+        start = decode_cursor(after)
+        if cls is None:
+            names = sorted(classes)
+        else:
+            names = [cls if isinstance(cls, str) else cls.__name__]
+        keys = []
+        for name in names:
+            if len(keys) > limit:
+                break
+            prefix = name + "."
+            if (not self.__table(name) or start is not None and
+                    start > prefix and not start.startswith(prefix)):
+                continue
+            keys += [k for k in self.__by_class.get(name, {})
+                     if start is None or k > start]
+            if name in self.__loaded:
+                continue
+            gone = {k for k in self.__dirty
+                    if k.startswith(prefix) and k not in self.__objects}
+            sql = 'SELECT id FROM "{}"'.format(name)
+            args = []
+            if start is not None and start.startswith(prefix):
+                sql += " WHERE id > ?"
+                args.append(start[len(prefix):])
+            sql += " ORDER BY id LIMIT ?"
+            args.append(limit + 1 + len(gone))
+            for row in self.__conn.execute(sql, args):
+                key = prefix + row[0]
+                if key not in gone and key not in self.__objects:
+                    keys.append(key)
+        keys, cursor = page_keys(keys, start, limit)
+        return [self.get(*k.split(".", 1)) for k in keys], cursor
+
+    def get(self, cls, id):
+        """Return the object of a class with the given id, or None.
+
+        Args:
+            cls (type or str): The model class or its name.
+            id (str): The id of the object.
+        """
+        name = cls if isinstance(cls, str) else cls.__name__
+        key = "{}.{}".format(name, id)
+        if key in self.__objects or key in self.__dirty:
+            return self.__objects.get(key)
+        if name in self.__loaded or not self.__table(name):
+            return None
+        cur = self.__conn.execute(
+            'SELECT * FROM "{}" WHERE id = ?'.format(name), (id,))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        obj = self.__build(classes[name], cur, row)
+        self.__store(key, obj)
+        return obj
+
+    def new(self, obj):
+        """Add obj to the objects to be stored on the next save."""
+        key = "{}.{}".format(obj.__class__.__name__, obj.id)
+        self.__store(key, obj)
+        self.__dirty.add(key)
+        if self.__depth:
+            self.__touched.add(key)
+
+    def bulk_create(self, cls, rows):
+        """Create an object of a class for every row, then save once.
+
+        Foreign keys are interned, as they are when rows are read.
+        Every row is checked before any object is stored.
+
+        Args:
+            cls (type or str): The model class or its name.
+            rows (iterable): A dict of attributes per object.
+
+        Returns:
+            The list of objects created.
+
+        Raises:
+            ValueError: If a row is invalid (see instances()) or sets
+                an id already stored or set by an earlier row. Its args
+                are a message and the index of the row.
+        """
+        if isinstance(cls, str):
+            cls = classes[cls]
+        name = cls.__name__
+        ids = set()
+        objs = []
+        for i, obj in enumerate(instances(cls, rows)):
+            if obj.id in ids or self.get(cls, obj.id) is not None:
+                raise ValueError("id already exists in row {}".format(i),
+                                 i)
+            ids.add(obj.id)
+            objs.append(obj)
+        for obj in objs:
+            for k, v in obj.__dict__.items():
+                if k.endswith("_id"):
+                    obj.__dict__[k] = self.intern(v)
+            key = name + "." + obj.id
+            self.__store(key, obj)
+            self.__dirty.add(key)
+            if self.__depth:
+                self.__touched.add(key)
+        self.save()
+        return objs
+
+    def delete(self, obj=None):
+        """Remove obj from storage on the next save."""
+        if obj is not None:
+            ocname = obj.__class__.__name__
+            key = "{}.{}".format(ocname, obj.id)
+            if self.__objects.pop(key, None) is not None:
+                self.__by_class[ocname].pop(key, None)
+            self.__dirty.add(key)
+            if self.__depth:
+                self.__touched.add(key)
+
+    def mark_dirty(self, obj):
+        """Flag obj so that the next save writes its row again."""
+        key = "{}.{}".format(obj.__class__.__name__, getattr(obj, "id", ""))
+        if self.__objects.get(key) is obj:
+            self.__dirty.add(key)
+            if self.__depth:
+                self.__touched.add(key)
+
+    def begin(self):
+        """Start a transaction, or join the one already open.
+
+        Pending changes are saved first. Until the outermost commit(),
+        save() writes nothing.
+        """
+        if self.__depth == 0:
+            self.save()
+        self.__depth += 1
+
+    def commit(self):
+        """End the current transaction, saving once if it is outermost.
+
+        Returns False if no transaction is open.
+        """
+        if self.__depth == 0:
+            return False
+        self.__depth -= 1
+        if self.__depth == 0:
+            self.__touched = set()
+            self.save()
+        return True
+
+    def rollback(self):
+        """Abort the open transaction, nested ones included.
+
+        None of its changes reached the database, so the objects it
+        touched are dropped from memory and read again when next used.
+        Returns False if no transaction is open.
+        """
+        if self.__depth == 0:
+            return False
+        self.__depth = 0
+        for key in self.__touched:
+            name = key.split(".", 1)[0]
+            if self.__objects.pop(key, None) is not None:
+                self.__by_class[name].pop(key, None)
+            self.__loaded.discard(name)
+        self.__touched = set()
+        self.__dirty = set()
+        return True
+
+    def in_transaction(self):
+        """Return True while a transaction is open."""
+        return self.__depth > 0
+
+    @contextmanager
+    def transaction(self):
+        """Run the body of a with statement as a transaction.
+
+        It is committed when the body completes and rolled back if it
+        raises.
+        """
+        self.begin()
+        try:
+            yield self
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
+
+    def save(self):
+        """Commit the rows of every object changed since the last save."""
+        if self.__depth:
+            return
+        with self.__conn:
+            for key in self.__dirty:
+                name, id = key.split(".", 1)
+                if not self.__table(name):
+                    continue
+                obj = self.__objects.get(key)
+                if obj is None:
+                    self.__conn.execute(
+                        'DELETE FROM "{}" WHERE id = ?'.format(name), (id,))
+                else:
+                    self.__write(obj)
+        self.__dirty.clear()
+
+    def reload(self):
+        """Open the database and create any missing table or index."""
+        self.__conn = sqlite3.connect(self.__db_path)
+        self.__objects = {}
+        self.__by_class = {}
+        self.__dirty = set()
+        self.__loaded = set()
+        self.__tables = set()
+        self.__depth = 0
+        self.__touched = set()
+        self.__interned = {}
+        with self.__conn:
+            for name in list(classes):
+                self.__table(name)
+
+    def __table(self, name):
+        """Create the table and indexes of a model class if missing.
+
+        Classes registered after the last reload get theirs on first
+        use. Return False if no model class has that name.
+        """
+        if name in self.__tables:
+            return True
+        cls = classes.get(name)
+        if cls is None:
+            return False
+        cols = ["id TEXT PRIMARY KEY", "created_at TEXT", "updated_at TEXT"]
+        cols += ["{} {}".format(k, sqltypes[t])
+                 for k, t in columns(cls).items()]
+        cols.append("__extra__ TEXT")
+        self.__conn.execute('CREATE TABLE IF NOT EXISTS "{}" ({})'
+                            .format(name, ", ".join(cols)))
+        for k in columns(cls):
+            if k.endswith("_id"):
+                self.__conn.execute(
+                    'CREATE INDEX IF NOT EXISTS "ix_{0}_{1}" '
+                    'ON "{0}" ({1})'.format(name, k))
+        self.__tables.add(name)
+        return True
+
+    def intern(self, value):
+        """Return the canonical copy of a string value.
+
+        Values are interned in a table dropped on reload; anything but
+        a str is returned unchanged.
+        """
+        if type(value) is not str:
+            return value
+        return self.__interned.setdefault(value, value)
+
+    def close(self):
+        """Close the database connection."""
+        if self.__conn is not None:
+            self.__conn.close()
+            self.__conn = None
+
+    def __write(self, obj):
+        """Insert or replace the row of obj."""
+        odict = obj.to_dict()
+        del odict["__class__"]
+        decl = columns(obj.__class__)
+        row = [odict.pop("id"), odict.pop("created_at"),
+               odict.pop("updated_at")]
+        for k, t in decl.items():
+            v = odict.pop(k, None)
+            row.append(json.dumps(v) if t is list and v is not None else v)
+        row.append(json.dumps(odict) if odict else None)
+        self.__conn.execute(
+            'INSERT OR REPLACE INTO "{}" VALUES ({})'.format(
+                obj.__class__.__name__, ", ".join("?" * len(row))), row)
+
+    def __build(self, cls, cur, row):
+        """Build an instance of cls from a row of its table."""
+        decl = columns(cls)
+        kwargs = {}
+        for (col, *_), v in zip(cur.description, row):
+            if v is None:
+                continue
+            if col == "__extra__":
+                kwargs.update(json.loads(v))
+            elif decl.get(col) is list:
+                kwargs[col] = json.loads(v)
+            elif col.endswith("_id"):
+                kwargs[col] = self.intern(v)
+            else:
+                kwargs[col] = v
+        return cls(**kwargs)
@@ -1,13 +1,258 @@
 #!/usr/bin/python3
 """Defining the FileStorage classes"""
+import atexit
+import bz2
+import gzip
 import json
-from models.base_model import BaseModel
+import lzma
+import multiprocessing
+import os
+import re
+import threading
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from time import monotonic
+from os import getenv
+from models.base_model import BaseModel, declared, instances, registry
 from models.user import User
 from models.state import State
 from models.city import City
 from models.place import Place
 from models.amenity import Amenity
 from models.review import Review
+from models.engine import codec
+from models.engine.columnar import Columns
+from models.engine.query import Query, decode_cursor, page_sorted
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Every model class by name, the ones imported above included.
+classes = registry
+
+compressors = {".gz": gzip, ".bz2": bz2, ".xz": lzma}
+
+
+def choice(name, default, choices):
+    """Return the value of an environment variable, default if unset.
+
+    Raises:
+        ValueError: If the value is not one of choices.
+    """
+    value = getenv(name, default)
+    if value not in choices:
+        raise ValueError("{} must be one of {}, not {!r}".format(
+            name, ", ".join(repr(c) for c in choices), value))
+    return value
+
+
+def openfile(path, mode="r"):
+    """Open path, compressed by the module its extension maps to in
+    compressors or else as a plain file.
+
+    Compressed files are (de)compressed as they are read or written,
+    one buffer at a time.
+
+    Args:
+        path (str): The path of the file.
+        mode (str): The mode, as for open().
+    """
+    module = compressors.get(os.path.splitext(path)[1])
+    if module is None:
+        return open(path, mode)
+    if "b" not in mode:
+        mode += "t"
+    return module.open(path, mode)
+
+
+def iterjson(f, size=1 << 16):
+    """Yield the (key, value) pairs of the JSON object in f one by one.
+
+    Only a window of about size characters is held in memory, instead
+    of the whole document plus the dict json.load() would build.
+
+    Args:
+        f (file): A text file holding a single JSON object.
+        size (int): The number of characters read at a time.
+    """
+    decode = json.JSONDecoder().raw_decode
+    buf, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = f.read(size)
+        eof = not chunk
+        buf = buf[pos:] + chunk
+        pos = 0
+        return not eof
+
+    def skip():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\n\r":
+                pos += 1
+            if pos < len(buf) or not fill():
+                return buf[pos:pos + 1]
+
+    def value():
+        nonlocal pos
+        while True:
+            try:
+                v, end = decode(buf, pos)
+            except ValueError:
+                if not fill():
+                    raise
+                continue
+            if end < len(buf) or eof:
+                pos = end
+                return v
+            fill()
+
+    if skip() != "{":
+        raise ValueError("Expecting a JSON object")
+    pos += 1
+    if skip() == "}":
+        return
+    while True:
+        skip()
+        key = value()
+        if skip() != ":":
+            raise ValueError("Expecting ':' delimiter")
+        pos += 1
+        skip()
+        yield key, value()
+        c = skip()
+        pos += 1
+        if c == "}":
+            return
+        if c != ",":
+            raise ValueError("Expecting ',' delimiter")
+
+
+def build(key, o):
+    """Return the (key, object, encoding) triple of a stored record.
+
+    The encoding is the record as json.dumps() writes it, for the
+    cache of FileStorage.
+    """
+    rec = json.dumps(o, default=datetime.isoformat)
+    cls = classes[o.pop("__class__")]
+    return key, cls(**o), rec
+
+
+def load_file(path, binary=False):
+    """Return the (key, object, encoding) triples of a storage file.
+
+    Meant to run in a worker process, one call per shard.
+    """
+    if binary:
+        with openfile(path, "rb") as f:
+            return [build("{}.{}".format(o["__class__"], o["id"]), o)
+                    for o in codec.load(f)]
+    with openfile(path) as f:
+        return [build(key, o) for key, o in iterjson(f)]
+
+
+_boundary = re.compile(r'\}\s*,\s*"')
+_space = re.compile(r"\s*")
+
+
+def load_range(path, start, end, size=1 << 16):
+    """Build the objects of a JSON storage file whose key starts in the
+    byte range [start, end).
+
+    Meant to run in a worker process, one call per slice of the file.
+    A record belongs to the slice its key starts in. A slice after the
+    first starts at the first '}, "' followed by a class key and an
+    object; the caller checks that the slices chain up, which rules
+    out a match inside a record. Only ASCII files, as
+    json.dumps() writes them by default, can be sliced.
+
+    Args:
+        path (str): The path of an uncompressed JSON file.
+        start (int): The offset of the slice.
+        end (int): The offset of the next slice.
+        size (int): The number of bytes read at a time past end.
+
+    Returns:
+        (first, stop, loaded): the offset of the first record and the
+        offset of the record after the last one, -1 once the closing
+        brace was reached, and the (key, object, encoding) triples.
+    """
+    decode = json.JSONDecoder().raw_decode
+    lead = max(0, start - 16)
+    with open(path, "rb") as f:
+        f.seek(lead)
+        buf = f.read(end - lead + size).decode("ascii")
+
+        def more():
+            nonlocal buf
+            chunk = f.read(max(size, len(buf)))
+            buf += chunk.decode("ascii")
+            return bool(chunk)
+
+        def skip(pos):
+            while True:
+                pos = _space.match(buf, pos).end()
+                if pos < len(buf) or not more():
+                    return pos
+
+        def value(pos):
+            while True:
+                try:
+                    return decode(buf, pos)
+                except ValueError:
+                    if not more():
+                        raise
+
+        if start == 0:
+            pos = skip(0)
+            if buf[pos:pos + 1] != "{":
+                raise ValueError("Expecting a JSON object")
+            pos = skip(pos + 1)
+            if buf[pos:pos + 1] == "}":
+                return -1, -1, []
+        else:
+            pos = 0
+            while True:
+                m = _boundary.search(buf, pos)
+                if m is None:
+                    if not more():
+                        return -1, -1, []
+                    continue
+                pos = m.end() - 1
+                if lead + pos < start:
+                    continue
+                try:
+                    key, p = value(pos)
+                    p = skip(p)
+                    q = skip(p + 1)
+                    if (buf[p:p + 1] == ":" and buf[q:q + 1] == "{" and
+                            key.split(".", 1)[0] in classes):
+                        break
+                except ValueError:
+                    pass
+                pos += 1
+        first = lead + pos
+        loaded = []
+        while lead + pos < end:
+            key, pos = value(pos)
+            pos = skip(pos)
+            if buf[pos:pos + 1] != ":":
+                raise ValueError("Expecting ':' delimiter")
+            o, pos = value(skip(pos + 1))
+            loaded.append(build(key, o))
+            pos = skip(pos)
+            c = buf[pos:pos + 1]
+            if c == "}":
+                return first, -1, loaded
+            if c != ",":
+                raise ValueError("Expecting ',' delimiter")
+            pos = skip(pos + 1)
+        return first, lead + pos, loaded
 
 
 class FileStorage:
@@ -16,30 +261,1301 @@ class FileStorage:
     Attributes:
         __file_path (str): The name of the file to save objects to.
         __objects (dict): A dictionary of instantiated objects.
+        __journal (bool): Append changed records to a log on save
+            instead of rewriting the whole file.
+        __log_path (str): The name of the journal file.
+        __encoded (dict): The (object, encoded JSON record) pair last
+            serialized for each key.
+        __dirty (set): The keys changed since the last save.
+        __mutable (set): The keys of the objects whose encoding holds a
+            list or dict. Such a value can change in place, unseen by
+            __setattr__, so save() checks their encoding again.
+        __sharded (bool): Keep one file per class in __shard_dir and
+            rewrite only the shards holding dirty objects.
+        __shard_dir (str): The directory holding the class shards.
+        __lazy (bool): Defer parsing the stored objects on reload until
+            they are first needed. get() then builds the one object it
+            is asked for, streaming the files past the other records;
+            listing a class builds its shard in sharded mode and the
+            whole store otherwise.
+        __pending (bool): Whether a lazy reload is still outstanding.
+        __loaded (set): The shards already read during a lazy reload.
+        __by_class (dict): __objects partitioned by class name.
+        __indexed (dict): The __objects dict __by_class was built for.
+        __nindexed (int): The number of objects in __by_class.
+        __fk_attrs (dict): The foreign-key attributes indexed per class.
+        __fk (dict): For each class name and foreign-key attribute, a
+            ({value: {key: obj}}, {key: value}) pair of indexes.
+        __fk_stale (set): The keys changed since __fk was refreshed.
+        __columns (dict): The Columns view of each class asked for.
+        __col_stale (set): The keys changed since __columns was
+            refreshed.
+        __sorted (dict): The sorted list of the keys of each class
+            paged through, and of every key under None.
+        __sort_stale (set): The keys added or removed since __sorted
+            was refreshed.
+        __binary (bool): Store objects in the compact binary format of
+            models.engine.codec instead of JSON.
+        __bin_path (str): The name of the file used in binary mode.
+        __compression (str): The extension of a compressor in
+            compressors ("gz", "bz2" or "xz") added to the names of the
+            data files and shards, or "" to store them uncompressed.
+            The journal itself is never compressed.
+        __workers (int): When above 1, reload builds the objects of
+            big files in this many worker processes: one shard each in
+            sharded mode, else one byte range of the (uncompressed, JSON)
+            data file each. The reload is then deferred as in lazy mode,
+            so the workers are never forked while models is still being
+            imported. Off by default: it only pays off with an idle core
+            per worker, and a 30,000 object reload takes about twice as
+            long with 2 workers as sequentially on a single core.
+        __parallel_min (int): The smallest data file, in bytes, split
+            across workers.
+        __interned (dict): The canonical copy of each foreign-key value
+            seen since the last reload, so that equal ids share one
+            string.
+        __window (float): When positive, save() only requests a write,
+            and a background flusher merges the requests made within
+            this many seconds into a single write.
+        __threshold (int): When positive, the flusher writes as soon as
+            this many objects are dirty, without waiting for the window.
+        __lock (threading.Condition): Serializes writes and wakes the
+            flusher.
+        __requested (bool): Whether a deferred write is outstanding.
+        __flusher (threading.Thread): The background flusher, if started.
+        __durability (str): When to fsync: "none" never, "always" after
+            every write, "batch" before each rename but otherwise only
+            at flush(), at exit or every __sync_interval seconds.
+        __sync_interval (float): The longest a "batch" write waits to
+            be synced.
+        __unsynced (set): The paths written but not yet synced.
+        __last_sync (float): The monotonic time of the last sync.
+        __sync_timer (threading.Timer): The pending "batch" sync, if any.
+        __at_exit (bool): Whether flush() is registered to run at exit.
+        __compact_ratio (float): In journal mode, compact once the log
+            grows past this many times the size of the snapshot (the
+            base file); 0 disables automatic compaction.
+        __compact_min (int): The smallest log size, in bytes, that
+            triggers an automatic compaction.
+        __compactor (threading.Thread): The running compaction, if any.
+        __lock_path (str): The file locked to coordinate processes
+            sharing the store: shared while reading, exclusive while
+            writing.
+        __flock_file (file): The open lock file while the lock is held.
+        __flock_ex (bool): Whether the lock held is exclusive.
+        __stamps (dict): The (inode, size, mtime) of each data file as
+            of its last read or write by this process.
+        __stamped (dict): The __objects dict __stamps describes.
+        __depth (int): The nesting depth of the open transaction.
+        __undo (dict): During a transaction, the (object, attributes)
+            each touched key held when first touched; (None, None) for
+            keys that did not exist.
+        __undo_dirty (set): The dirty set as of the start of the
+            transaction.
     """
     __file_path = "file.json"
     __objects = {}
+    __journal = getenv("HBNB_STORAGE_JOURNAL") == "1"
+    __log_path = "file.json.log"
+    __encoded = {}
+    __dirty = set()
+    __mutable = set()
+    __sharded = getenv("HBNB_STORAGE_SHARDED") == "1"
+    __shard_dir = "file.json.d"
+    __lazy = getenv("HBNB_STORAGE_LAZY") == "1"
+    __pending = False
+    __loaded = set()
+    __by_class = {}
+    __indexed = None
+    __nindexed = 0
+    __fk_attrs = {
+        "City": ("state_id",),
+        "Place": ("city_id", "user_id"),
+        "Review": ("place_id", "user_id")
+    }
+    __fk = {}
+    __fk_stale = set()
+    __columns = {}
+    __col_stale = set()
+    __sorted = {}
+    __sort_stale = set()
+    __binary = getenv("HBNB_STORAGE_BINARY") == "1"
+    __bin_path = "file.bin"
+    __compression = choice("HBNB_STORAGE_COMPRESSION", "",
+                           ("", "gz", "bz2", "xz"))
+    __workers = int(getenv("HBNB_STORAGE_WORKERS", "0"))
+    __parallel_min = 1 << 20
+    __interned = {}
+    __window = float(getenv("HBNB_STORAGE_FLUSH_WINDOW", "0"))
+    __threshold = int(getenv("HBNB_STORAGE_FLUSH_THRESHOLD", "0"))
+    __lock = threading.Condition(threading.RLock())
+    __requested = False
+    __flusher = None
+    __durability = choice("HBNB_STORAGE_DURABILITY", "none",
+                          ("none", "batch", "always"))
+    __sync_interval = 1.0
+    __unsynced = set()
+    __last_sync = 0.0
+    __sync_timer = None
+    __at_exit = False
+    __compact_ratio = float(getenv("HBNB_STORAGE_COMPACT_RATIO", "2"))
+    __compact_min = 1 << 16
+    __compactor = None
+    __lock_path = "file.json.lock"
+    __flock_file = None
+    __flock_ex = False
+    __stamps = {}
+    __stamped = None
+    __depth = 0
+    __undo = None
+    __undo_dirty = None
+
+    def all(self, cls=None):
+        """Return the dictionary of stored objects.
+
+        Args:
+            cls (type or str): If given, only return the objects of this
+                class (or class name). The partition is returned as is
+                and must not be modified.
+        """
+        if cls is None:
+            if FileStorage.__pending:
+                self.__ensure()
+            return FileStorage.__objects
+        name = cls if isinstance(cls, str) else cls.__name__
+        if FileStorage.__pending:
+            self.__ensure(name)
+        return self.__partitions().get(name, {})
+
+    def __partitions(self):
+        """Return __by_class, rebuilding it when __objects was replaced
+        or resized without going through new() or delete()."""
+        odict = FileStorage.__objects
+        if (FileStorage.__indexed is not odict or
+                FileStorage.__nindexed != len(odict)):
+            by_class = {}
+            for key, obj in odict.items():
+                by_class.setdefault(key.split(".", 1)[0], {})[key] = obj
+            FileStorage.__by_class = by_class
+            FileStorage.__indexed = odict
+            FileStorage.__nindexed = len(odict)
+            FileStorage.__fk = {}
+            FileStorage.__columns = {}
+            FileStorage.__sorted = {}
+        return FileStorage.__by_class
+
+    def __reindex(self, ocname, key):
+        """Flag key for update in the indexes kept for its class."""
+        if ocname in FileStorage.__fk:
+            FileStorage.__fk_stale.add(key)
+        if ocname in FileStorage.__columns:
+            FileStorage.__col_stale.add(key)
+        if ocname in FileStorage.__sorted or None in FileStorage.__sorted:
+            FileStorage.__sort_stale.add(key)
 
-    def all(self):
-        return FileStorage.__objects
+    def columns(self, cls):
+        """Return the columnar view of the numeric attributes of a class.
+
+        The view is built on first use and brought up to date with the
+        objects created, changed or deleted since on each call.
+
+        Args:
+            cls (type or str): The model class or its name.
+        """
+        name = cls if isinstance(cls, str) else cls.__name__
+        objdict = self.all(name)
+        cols = FileStorage.__columns.get(name)
+        if cols is None:
+            fields = declared(classes.get(name))
+            cols = Columns({k: type(v) for k, v in fields.items()})
+            FileStorage.__columns[name] = cols
+            FileStorage.__col_stale.update(objdict)
+        odict = FileStorage.__objects
+        for key in FileStorage.__col_stale:
+            cols = FileStorage.__columns.get(key.split(".", 1)[0])
+            if cols is None:
+                continue
+            obj = odict.get(key)
+            if obj is None:
+                cols.discard(key)
+            else:
+                cols.set(key, obj)
+        FileStorage.__col_stale.clear()
+        return FileStorage.__columns[name]
+
+    def by_attr(self, cls, attr, value):
+        """Return the objects of a class whose attribute equals value.
+
+        Lookups on the foreign-key attributes listed in __fk_attrs are
+        answered from a reverse index built on first use; any other
+        attribute is scanned.
+
+        Args:
+            cls (type or str): The model class or its name.
+            attr (str): The attribute name, e.g. "state_id".
+            value (any): The value to match.
+        """
+        name = cls if isinstance(cls, str) else cls.__name__
+        objdict = self.all(name)
+        if attr not in FileStorage.__fk_attrs.get(name, ()):
+            return {k: o for k, o in objdict.items()
+                    if getattr(o, attr, None) == value}
+        attrs = FileStorage.__fk.setdefault(name, {})
+        if attr not in attrs:
+            attrs[attr] = ({}, {})
+            FileStorage.__fk_stale.update(objdict)
+        self.__refresh_fk()
+        return attrs[attr][0].get(value, {})
+
+    def indexed(self, cls):
+        """Return the attributes of a class that by_attr() answers from
+        an index."""
+        name = cls if isinstance(cls, str) else cls.__name__
+        return FileStorage.__fk_attrs.get(name, ())
+
+    def query(self, cls):
+        """Return a Query over the objects of a class.
+
+        e.g. storage.query(Place).where(price_by_night__lt=100)
+        .only("id", "name").limit(50)
+
+        Args:
+            cls (type or str): The model class or its name.
+        """
+        return Query(self, cls)
+
+    def page(self, cls=None, limit=100, after=None):
+        """Return a page of stored objects, ordered by key.
+
+        Pages are cut from a sorted list of the keys, built on first use
+        and kept up to date with the objects created or deleted since,
+        so walking the whole store costs O(n log n) overall.
+
+        Args:
+            cls (type or str): If given, only list the objects of this
+                class (or class name).
+            limit (int): The page size.
+            after (str): The cursor returned with the previous page, or
+                None for the first page.
+
+        Returns:
+            The list of objects on the page and the cursor of the next
+            page, or None if it is the last one.
+
+        Raises:
+            ValueError: If the cursor or page size is invalid.
+        """
+        start = decode_cursor(after)
+        name = cls if cls is None or isinstance(cls, str) else cls.__name__
+        keys, cursor = page_sorted(self.__sorted_keys(name), start, limit)
+        odict = FileStorage.__objects
+        return [odict[k] for k in keys], cursor
+
+    def __sorted_keys(self, name):
+        """Return the sorted keys of a class, or of every class if name
+        is None, bringing __sorted up to date with __sort_stale."""
+        objdict = self.all(name)
+        self.__partitions()
+        keys = FileStorage.__sorted.get(name)
+        if keys is None:
+            keys = FileStorage.__sorted[name] = sorted(objdict)
+        odict = FileStorage.__objects
+        for key in FileStorage.__sort_stale:
+            present = key in odict
+            for scope in (key.split(".", 1)[0], None):
+                keys = FileStorage.__sorted.get(scope)
+                if keys is None:
+                    continue
+                i = bisect_left(keys, key)
+                found = i < len(keys) and keys[i] == key
+                if present and not found:
+                    keys.insert(i, key)
+                elif found and not present:
+                    del keys[i]
+        FileStorage.__sort_stale.clear()
+        return FileStorage.__sorted[name]
+
+    def __refresh_fk(self):
+        """Bring __fk up to date with the keys in __fk_stale."""
+        odict = FileStorage.__objects
+        for key in FileStorage.__fk_stale:
+            attrs = FileStorage.__fk.get(key.split(".", 1)[0], {})
+            obj = odict.get(key)
+            for attr, (values, of_key) in attrs.items():
+                if key in of_key:
+                    old = of_key.pop(key)
+                    bucket = values[old]
+                    del bucket[key]
+                    if not bucket:
+                        del values[old]
+                if obj is not None:
+                    value = getattr(obj, attr, None)
+                    try:
+                        values.setdefault(value, {})[key] = obj
+                    except TypeError:
+                        continue
+                    of_key[key] = value
+        FileStorage.__fk_stale.clear()
+
+    def get(self, cls, id):
+        """Return the object of a class with the given id, or None.
+
+        Args:
+            cls (type or str): The model class or its name.
+            id (str): The id of the object.
+        """
+        name = cls if isinstance(cls, str) else cls.__name__
+        key = "{}.{}".format(name, id)
+        if (FileStorage.__pending and key not in FileStorage.__objects and
+                key not in FileStorage.__dirty and
+                name not in FileStorage.__loaded):
+            self.__fetch(key)
+        return FileStorage.__objects.get(key)
 
     def new(self, obj):
+        key = "{}.{}".format(obj.__class__.__name__, obj.id)
+        self.__touch(key)
+        self.__store(key, obj)
+        FileStorage.__dirty.add(key)
+
+    def bulk_create(self, cls, rows):
+        """Create an object of a class for every row, then save once.
+
+        The objects are built in one pass, without a new() call each,
+        and their foreign keys interned as on reload. Every row is
+        checked before any object is stored.
+
+        Args:
+            cls (type or str): The model class or its name.
+            rows (iterable): A dict of attributes per object.
+
+        Returns:
+            The list of objects created.
+
+        Raises:
+            ValueError: If a row is invalid (see instances()) or sets
+                an id already stored or set by an earlier row. Its args
+                are a message and the index of the row.
+        """
+        if isinstance(cls, str):
+            cls = classes[cls]
+        name = cls.__name__
+        stored = self.all(name)
+        ids = set()
+        objs = []
+        for i, obj in enumerate(instances(cls, rows)):
+            if obj.id in ids or name + "." + obj.id in stored:
+                raise ValueError("id already exists in row {}".format(i),
+                                 i)
+            ids.add(obj.id)
+            objs.append(obj)
+        dirty = FileStorage.__dirty
+        for obj in objs:
+            self.__intern_ids(obj.__dict__)
+            key = name + "." + obj.id
+            self.__touch(key)
+            self.__store(key, obj)
+            dirty.add(key)
+        self.save()
+        return objs
+
+    def __store(self, key, obj):
+        """Put obj under key in __objects and its class partition."""
+        ocname = obj.__class__.__name__
+        by_class = self.__partitions()
+        if key not in FileStorage.__objects:
+            FileStorage.__nindexed += 1
+        FileStorage.__objects[key] = obj
+        by_class.setdefault(ocname, {})[key] = obj
+        self.__reindex(ocname, key)
+
+    def delete(self, obj=None):
+        """Remove obj from __objects if it is present."""
+        if obj is not None:
+            key = "{}.{}".format(obj.__class__.__name__, obj.id)
+            if FileStorage.__objects.get(key) is not None:
+                self.__touch(key)
+                self.__remove(key)
+                FileStorage.__dirty.add(key)
+
+    def __remove(self, key):
+        """Take key out of __objects and its class partition."""
+        ocname = key.split(".", 1)[0]
+        by_class = self.__partitions()
+        if FileStorage.__objects.pop(key, None) is not None:
+            FileStorage.__nindexed -= 1
+            by_class[ocname].pop(key, None)
+            self.__reindex(ocname, key)
+
+    def mark_dirty(self, obj):
+        """Flag obj so that the next save re-serializes it.
+
+        Setting an attribute does it. Code that writes to the __dict__
+        of an object holding no list or dict value must call it, or the
+        change may not be saved. Objects that are not stored (yet) are
+        ignored.
+        """
         ocname = obj.__class__.__name__
-        FileStorage.__objects["{}.{}".format(ocname, obj.id)] = obj
+        key = "{}.{}".format(ocname, getattr(obj, "id", ""))
+        if FileStorage.__objects.get(key) is obj:
+            self.__touch(key)
+            FileStorage.__dirty.add(key)
+            self.__reindex(ocname, key)
+
+    def __touch(self, key):
+        """Remember what key holds before a transaction first changes it."""
+        undo = FileStorage.__undo
+        if undo is None or key in undo:
+            return
+        obj = FileStorage.__objects.get(key)
+        undo[key] = (obj, None if obj is None else dict(obj.__dict__))
+
+    def begin(self):
+        """Start a transaction, or join the one already open.
+
+        Until the outermost commit(), save() only records that a write
+        is wanted and rollback() can undo every change made to stored
+        objects.
+        """
+        with FileStorage.__lock:
+            if FileStorage.__depth == 0:
+                FileStorage.__undo = {}
+                FileStorage.__undo_dirty = set(FileStorage.__dirty)
+            FileStorage.__depth += 1
+
+    def commit(self):
+        """End the current transaction, saving once if it is outermost.
+
+        Returns False if no transaction is open.
+        """
+        with FileStorage.__lock:
+            if FileStorage.__depth == 0:
+                return False
+            FileStorage.__depth -= 1
+            if FileStorage.__depth == 0:
+                FileStorage.__undo = None
+                FileStorage.__undo_dirty = None
+                self.save()
+            return True
+
+    def rollback(self):
+        """Abort the open transaction, nested ones included.
+
+        Stored objects get back the attributes they had when it began,
+        objects created in it are dropped and deleted ones restored.
+        Returns False if no transaction is open.
+        """
+        with FileStorage.__lock:
+            if FileStorage.__depth == 0:
+                return False
+            undo = FileStorage.__undo
+            dirty = FileStorage.__undo_dirty
+            FileStorage.__depth = 0
+            FileStorage.__undo = None
+            FileStorage.__undo_dirty = None
+            for key, (obj, attrs) in undo.items():
+                if obj is None:
+                    self.__remove(key)
+                    continue
+                obj.__dict__.clear()
+                obj.__dict__.update(attrs)
+                self.__store(key, obj)
+            FileStorage.__dirty = dirty
+            return True
+
+    def in_transaction(self):
+        """Return True while a transaction is open."""
+        return FileStorage.__depth > 0
+
+    @contextmanager
+    def transaction(self):
+        """Run the body of a with statement as a transaction.
+
+        It is committed when the body completes and rolled back if it
+        raises.
+        """
+        self.begin()
+        try:
+            yield self
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
+
+    def __encode(self, key, obj, dirty):
+        """Return the encoded record of obj, stored under key.
+
+        The cached encoding is reused unless the key is in dirty or now
+        maps to a different object.
+        """
+        hit = FileStorage.__encoded.get(key)
+        if hit is None or hit[0] is not obj or key in dirty:
+            odict = obj.to_dict()
+            self.__track(key, odict.values())
+            hit = (obj, json.dumps(odict))
+            FileStorage.__encoded[key] = hit
+        return hit[1]
+
+    def __track(self, key, values):
+        """Keep key in __mutable if any of values is a list or dict."""
+        for value in values:
+            if isinstance(value, (list, dict)):
+                FileStorage.__mutable.add(key)
+                return
+        FileStorage.__mutable.discard(key)
+
+    def __in_place(self):
+        """Return the keys in __mutable whose object no longer encodes
+        to its cached record, having changed in place."""
+        odict = FileStorage.__objects
+        encoded = FileStorage.__encoded
+        changed = set()
+        for key in list(FileStorage.__mutable):
+            obj = odict.get(key)
+            hit = encoded.get(key)
+            if obj is None or hit is None or hit[0] is not obj:
+                FileStorage.__mutable.discard(key)
+            elif json.dumps(obj.to_dict()) != hit[1]:
+                changed.add(key)
+        return changed
 
     def save(self):
+        if FileStorage.__depth > 0:
+            return
+        if FileStorage.__window <= 0:
+            self.__write()
+            return
+        with FileStorage.__lock:
+            FileStorage.__requested = True
+            if FileStorage.__flusher is None:
+                FileStorage.__flusher = threading.Thread(
+                    target=self.__flush_loop, daemon=True)
+                FileStorage.__flusher.start()
+                self.__flush_at_exit()
+            FileStorage.__lock.notify()
+
+    def __flush_at_exit(self):
+        """Register flush() to run when the interpreter exits, once."""
+        if not FileStorage.__at_exit:
+            FileStorage.__at_exit = True
+            atexit.register(self.flush)
+
+    def flush(self):
+        """Perform any write deferred by save() before returning."""
+        with FileStorage.__lock:
+            if FileStorage.__requested:
+                self.__write()
+            self.__sync()
+
+    def __sync(self):
+        """Fsync every path written since the last sync."""
+        with FileStorage.__lock:
+            for path in FileStorage.__unsynced:
+                try:
+                    self.__fsync(path)
+                except OSError:
+                    pass
+            FileStorage.__unsynced.clear()
+            FileStorage.__last_sync = monotonic()
+
+    def __fsync(self, path):
+        """Fsync a file or directory by path."""
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def __written(self, path):
+        """Sync a written file or directory now or later, per __durability.
+
+        A deferred sync runs on a timer, or at exit at the latest.
+        """
+        if FileStorage.__durability == "none":
+            return
+        FileStorage.__unsynced.add(path)
+        self.__flush_at_exit()
+        wait = (FileStorage.__sync_interval -
+                (monotonic() - FileStorage.__last_sync))
+        if FileStorage.__durability == "always" or wait <= 0:
+            self.__sync()
+            return
+        timer = FileStorage.__sync_timer
+        if timer is None or not timer.is_alive():
+            timer = threading.Timer(min(wait, FileStorage.__sync_interval),
+                                    self.__sync)
+            timer.daemon = True
+            timer.start()
+            FileStorage.__sync_timer = timer
+
+    @contextmanager
+    def __replace(self, path, mode="w"):
+        """Open a temporary file that atomically replaces path.
+
+        The file is fsynced before the rename unless durability is
+        "none", so a crash leaves either the old or the new contents.
+        It is compressed like path.
+        """
+        tmp = self.__sibling(path, ".tmp")
+        try:
+            with openfile(tmp, mode) as f:
+                yield f
+            if FileStorage.__durability != "none":
+                self.__fsync(tmp)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        self.__written(os.path.dirname(path) or ".")
+
+    def __sibling(self, path, suffix):
+        """Return path with suffix added before any compression
+        extension, so the new name is compressed alike."""
+        base, ext = os.path.splitext(path)
+        if ext in compressors:
+            return base + suffix + ext
+        return path + suffix
+
+    def __flush_loop(self):
+        """Merge the save requests of each window into one write."""
+        lock = FileStorage.__lock
+        with lock:
+            while True:
+                while not FileStorage.__requested:
+                    lock.wait()
+                deadline = monotonic() + FileStorage.__window
+                while (FileStorage.__requested and not self.__due() and
+                       lock.wait(deadline - monotonic())):
+                    pass
+                if FileStorage.__requested:
+                    self.__write()
+
+    def __due(self):
+        """Return True once enough objects are dirty to write early."""
+        return 0 < FileStorage.__threshold <= len(FileStorage.__dirty)
+
+    def __write(self):
+        """Persist the changes made since the last write.
+
+        The dirty set is swapped for a fresh one first, so objects can
+        keep changing while the write is in progress; objects changed
+        in place are added to it. Changes other
+        processes saved since our last read are merged in beforehand,
+        and the objects a lazy reload deferred that are rewritten are
+        read before the swap, while the dirty set still tells which
+        stored objects were deleted.
+        Nothing is written while a transaction is open; its commit
+        saves.
+        """
+        with FileStorage.__lock:
+            FileStorage.__requested = False
+            if FileStorage.__depth > 0:
+                return
+            with self.__flock(True):
+                if FileStorage.__pending and not FileStorage.__journal:
+                    if FileStorage.__sharded:
+                        names = {key.split(".", 1)[0]
+                                 for key in FileStorage.__dirty}
+                    else:
+                        names = (None,)
+                    for name in names:
+                        self.__ensure(name)
+                dirty = FileStorage.__dirty
+                FileStorage.__dirty = set()
+                dirty |= self.__in_place()
+                try:
+                    self.__merge(dirty)
+                    if FileStorage.__journal:
+                        self.__append(dirty)
+                    elif FileStorage.__sharded:
+                        self.__write_shards(dirty)
+                    else:
+                        self.__ensure()
+                        items = list(FileStorage.__objects.items())
+                        self.__dump(self.__data_path(), items, dirty)
+                except BaseException:
+                    FileStorage.__dirty |= dirty
+                    raise
+
+    def __data_path(self):
+        """Return the path of the whole-store file."""
+        if FileStorage.__binary:
+            return FileStorage.__bin_path + self.__compressed()
+        return FileStorage.__file_path + self.__compressed()
+
+    def __compressed(self):
+        """Return the extension added to data files, if any."""
+        if FileStorage.__compression:
+            return "." + FileStorage.__compression
+        return ""
+
+    def __dump(self, path, items, dirty):
+        """Write the (key, object) pairs in items to path.
+
+        In JSON only the objects in dirty are re-encoded, each as it
+        is written, so the file is never held in memory whole; the
+        binary format shares one string table across the file, so it
+        is rebuilt.
+        """
+        odict = FileStorage.__objects
+        encoded = FileStorage.__encoded
+        if FileStorage.__binary:
+            with self.__replace(path, "wb") as f:
+                enc = codec.Encoder(f, classes)
+                for key, obj in items:
+                    enc.write(obj.to_dict())
+            self.__stamp(path)
+            return
+        if len(encoded) > len(odict):
+            for key in [k for k in list(encoded) if k not in odict]:
+                del encoded[key]
+        parts = ("{}: {}".format(json.dumps(key),
+                                 self.__encode(key, obj, dirty))
+                 for key, obj in items)
+        with self.__replace(path) as f:
+            f.write("{")
+            sep = ""
+            for part in parts:
+                f.write(sep + part)
+                sep = ", "
+            f.write("}")
+        self.__stamp(path)
+
+    def __read(self, path):
+        """Yield the (key, record) pairs stored in a data file."""
+        if FileStorage.__binary:
+            with openfile(path, "rb") as f:
+                for o in codec.load(f):
+                    yield "{}.{}".format(o["__class__"], o["id"]), o
+        else:
+            with openfile(path) as f:
+                yield from iterjson(f)
+
+    def __shard(self, cls_name):
+        """Return the path of the shard file of cls_name."""
+        ext = ".bin" if FileStorage.__binary else ".json"
+        ext += self.__compressed()
+        return os.path.join(FileStorage.__shard_dir, cls_name + ext)
+
+    def __write_shards(self, dirty):
+        """Rewrite the shard of every class that has a dirty object."""
+        names = {key.split(".", 1)[0] for key in dirty}
+        if not names:
+            return
+        os.makedirs(FileStorage.__shard_dir, exist_ok=True)
+        for name in names:
+            self.__ensure(name)
+            items = list(self.__partitions().get(name, {}).items())
+            self.__dump(self.__shard(name), items, dirty)
+
+    def __append(self, dirty):
+        """Append the records changed since the last save to the journal.
+
+        An upsert is written for every dirty object whose encoding
+        differs from the last journaled one, and a tombstone (a null
+        object) for every journaled key no longer in __objects.
+        """
         odict = FileStorage.__objects
-        objdict = {obj: odict[obj].to_dict() for obj in odict.keys()}
-        with open(FileStorage.__file_path, "w") as f:
-            json.dump(objdict, f)
+        encoded = FileStorage.__encoded
+        lines = []
+        for key in dirty:
+            obj = odict.get(key)
+            if obj is not None:
+                prev = encoded.get(key)
+                rec = self.__encode(key, obj, dirty)
+                if prev is not None and prev[1] == rec:
+                    continue
+            elif encoded.pop(key, None) is not None:
+                rec = "null"
+            else:
+                continue
+            lines.append('{{"key": {}, "obj": {}}}\n'.format(
+                json.dumps(key), rec))
+        if lines:
+            with open(FileStorage.__log_path, "a") as f:
+                f.writelines(lines)
+                size = f.tell()
+            self.__stamp(FileStorage.__log_path)
+            self.__written(FileStorage.__log_path)
+            if self.__should_compact(size):
+                FileStorage.__compactor = threading.Thread(
+                    target=self.compact, daemon=True)
+                FileStorage.__compactor.start()
+
+    def __should_compact(self, size):
+        """Return True if a log of size bytes is due for compaction."""
+        if (FileStorage.__compact_ratio <= 0 or
+                size < FileStorage.__compact_min or
+                (FileStorage.__compactor is not None and
+                 FileStorage.__compactor.is_alive())):
+            return False
+        try:
+            base = os.path.getsize(self.__data_path())
+        except OSError:
+            base = 0
+        return size > FileStorage.__compact_ratio * base
+
+    def compact(self):
+        """Fold the journal into a new snapshot and truncate it.
+
+        Under the write lock, the objects a lazy reload deferred are
+        read, pending changes are appended and the log is moved aside
+        to <log>.1, so new saves start a fresh log. The snapshot is
+        then written from the cached encodings without holding the
+        lock, and swapped in as <log>.1 is removed, under the lock
+        again so other processes never see one without the other. A
+        crash at any point leaves snapshot + <log>.1 + log replaying to
+        the same state.
+
+        If the snapshot or <log>.1 changed in between, another
+        compaction ran meanwhile and the new snapshot may be older than
+        the one on disk; it is then dropped.
+
+        Returns:
+            True if the snapshot was replaced, False if it was dropped.
+        """
+        old = FileStorage.__log_path + ".1"
+        path = self.__data_path()
+        with FileStorage.__lock, self.__flock(True):
+            self.__ensure()
+            self.__write()
+            records = [(k, v[1]) for k, v in FileStorage.__encoded.items()]
+            if os.path.exists(FileStorage.__log_path):
+                if os.path.exists(old):
+                    with open(FileStorage.__log_path) as src, \
+                            open(old, "a") as dst:
+                        dst.writelines(src)
+                    os.remove(FileStorage.__log_path)
+                else:
+                    os.replace(FileStorage.__log_path, old)
+            self.__stamp(FileStorage.__log_path)
+            self.__stamp(old)
+            stamps = self.__stat(path), self.__stat(old)
+        new = self.__sibling(path, ".new")
+        if FileStorage.__binary:
+            with self.__replace(new, "wb") as f:
+                enc = codec.Encoder(f, classes)
+                for key, rec in records:
+                    enc.write(json.loads(rec))
+        else:
+            with self.__replace(new) as f:
+                f.write("{")
+                sep = ""
+                for key, rec in records:
+                    f.write("{}{}: {}".format(sep, json.dumps(key), rec))
+                    sep = ", "
+                f.write("}")
+        with FileStorage.__lock, self.__flock(True):
+            if (self.__stat(path), self.__stat(old)) != stamps:
+                os.remove(new)
+                return False
+            os.replace(new, path)
+            self.__written(os.path.dirname(path) or ".")
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass
+            self.__stamp(path)
+            self.__stamp(old)
+        return True
+
+    def __replay(self, path, offset=0):
+        """Yield the (key, record) pairs of a journal file in order.
+
+        A tombstone has None as its record. A truncated trailing line
+        left by a crash mid-append ends the replay.
+
+        Args:
+            path (str): The journal file.
+            offset (int): The byte offset to start reading from.
+        """
+        with open(path) as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    return
+                yield rec["key"], rec["obj"]
+
+    def intern(self, value):
+        """Return the canonical copy of a string value.
+
+        Values are interned in a table dropped on reload; anything but
+        a str is returned unchanged.
+        """
+        if type(value) is not str:
+            return value
+        return FileStorage.__interned.setdefault(value, value)
+
+    def __intern_ids(self, odict):
+        """Intern the foreign keys, attributes named *_id or *_ids, of
+        an object or record dict in place."""
+        table = FileStorage.__interned
+        for k, v in odict.items():
+            if k.endswith("_id") and type(v) is str:
+                odict[k] = table.setdefault(v, v)
+            elif k.endswith("_ids") and type(v) is list:
+                odict[k] = [table.setdefault(i, i) if type(i) is str else i
+                            for i in v]
 
     def reload(self):
+        FileStorage.__interned = {}
+        FileStorage.__loaded = set()
+        if FileStorage.__lazy or FileStorage.__workers > 1:
+            FileStorage.__pending = True
+            return
+        self.__reload()
+
+    def __ensure(self, name=None):
+        """Hydrate the objects a lazy reload deferred.
+
+        With a class name in lazy, sharded mode only that shard is
+        read, otherwise everything still on disk is.
+        """
+        if not FileStorage.__pending:
+            return
+        if (name is not None and FileStorage.__lazy and
+                FileStorage.__sharded and not FileStorage.__journal):
+            if name not in FileStorage.__loaded:
+                self.__keeping(self.load, name)
+            return
+        FileStorage.__pending = False
+        self.__keeping(self.__reload)
+
+    def __keeping(self, load, *args):
+        """Call load(*args), keeping the objects already in __objects.
+
+        These were fetched, created, changed or deleted before the
+        deferred objects were read, and must not be replaced by fresh
+        copies from disk, nor deleted ones restored.
+        """
+        kept = dict(FileStorage.__objects)
+        dirty = set(FileStorage.__dirty)
+        load(*args)
+        for key in dirty:
+            if key not in kept:
+                self.__remove(key)
+                FileStorage.__encoded.pop(key, None)
+        for key, obj in kept.items():
+            if FileStorage.__objects.get(key) is not obj:
+                self.__store(key, obj)
+        FileStorage.__dirty |= dirty
+
+    def __fetch(self, key):
+        """Build and store the object of key alone during a lazy reload.
+
+        The files are streamed and only the matching record is built;
+        in journal mode the last record of the key wins.
+        """
+        name = key.split(".", 1)[0]
+        if FileStorage.__journal:
+            paths = self.__journal_paths()
+            sources = (self.__read(paths[0]), self.__replay(paths[1]),
+                       self.__replay(paths[2]))
+        elif FileStorage.__sharded:
+            sources = (self.__read(self.__shard(name)),)
+        else:
+            sources = (self.__read(self.__data_path()),)
+        found = None
+        with FileStorage.__lock, self.__flock():
+            for k, o in self.__records(sources):
+                if k == key:
+                    found = o
+                    if not FileStorage.__journal:
+                        break
+            if found is not None:
+                self.__hydrate([(key, found)], True)
+
+    def __reload(self):
+        """Read every stored object into __objects."""
+        with FileStorage.__lock, self.__flock():
+            self.__reload_locked()
+
+    def __reload_locked(self):
+        """Read every stored object, holding the shared lock."""
+        if FileStorage.__journal:
+            paths = self.__journal_paths()
+            sources = (self.__read(paths[0]), self.__replay(paths[1]),
+                       self.__replay(paths[2]))
+            if self.__load_ranges(paths[0]):
+                sources = sources[1:]
+            self.__hydrate(self.__records(sources), True)
+            for path in paths:
+                self.__stamp(path)
+            return
+        if FileStorage.__sharded:
+            try:
+                names = os.listdir(FileStorage.__shard_dir)
+            except FileNotFoundError:
+                return
+            ext = ".bin" if FileStorage.__binary else ".json"
+            ext += self.__compressed()
+            names = [name[:-len(ext)] for name in sorted(names)
+                     if name.endswith(ext) and
+                     name[:-len(ext)] not in FileStorage.__loaded]
+            if not self.__load_shards(names):
+                for name in names:
+                    self.load(name)
+            return
+        path = self.__data_path()
+        if not self.__load_ranges(path):
+            self.__hydrate(self.__records((self.__read(path),)), True)
+        self.__stamp(path)
+
+    def __pool(self):
+        """Return a process pool of __workers workers, or None if
+        reloads run in this process only.
+
+        Workers are forked, so they need not import models again,
+        which would reload the store in each of them.
+        """
+        if (FileStorage.__workers < 2 or
+                "fork" not in multiprocessing.get_all_start_methods()):
+            return None
+        return ProcessPoolExecutor(FileStorage.__workers,
+                                   multiprocessing.get_context("fork"))
+
+    def __load_ranges(self, path):
+        """Hydrate a big JSON data file by byte ranges in worker
+        processes.
+
+        Returns False, having loaded nothing, if the file cannot be
+        split this way; it is then read sequentially.
+        """
+        if (FileStorage.__binary or
+                os.path.splitext(path)[1] in compressors):
+            return False
         try:
-            with open(FileStorage.__file_path) as f:
-                objdict = json.load(f)
-                for o in objdict.values():
-                    cls_name = o["__class__"]
-                    del o["__class__"]
-                    self.new(eval(cls_name)(**o))
+            size = os.path.getsize(path)
+        except OSError:
+            return False
+        if size < FileStorage.__parallel_min:
+            return False
+        pool = self.__pool()
+        if pool is None:
+            return False
+        n = FileStorage.__workers
+        bounds = [size * i // n for i in range(n + 1)]
+        try:
+            with pool:
+                results = list(pool.map(load_range, [path] * n,
+                                        bounds[:-1], bounds[1:]))
+        except ValueError:
+            return False
+        for prev, result in zip(results, results[1:]):
+            if prev[1] != result[0]:
+                return False
+        if results[-1][1] != -1:
+            return False
+        for first, stop, loaded in results:
+            self.__merge_loaded(loaded)
+        return True
+
+    def __load_shards(self, names):
+        """Hydrate the shards of names, in order, in worker processes.
+
+        Returns False, having loaded nothing, if there are no workers.
+        """
+        pool = self.__pool()
+        if pool is None or len(names) < 2:
+            return False
+        paths = [self.__shard(name) for name in names]
+        with pool:
+            results = list(pool.map(load_file, paths,
+                                    [FileStorage.__binary] * len(paths)))
+        for name, path, loaded in zip(names, paths, results):
+            FileStorage.__loaded.add(name)
+            self.__merge_loaded(loaded)
+            self.__stamp(path)
+        return True
+
+    def __merge_loaded(self, loaded):
+        """Store the (key, object, encoding) triples built by a worker."""
+        encoded = FileStorage.__encoded
+        for key, obj, rec in loaded:
+            self.__intern_ids(obj.__dict__)
+            self.__store(key, obj)
+            encoded[key] = (obj, rec)
+            self.__track(key, obj.__dict__.values())
+            FileStorage.__dirty.discard(key)
+
+    def __journal_paths(self):
+        """Return the snapshot, rotated log and log paths, in replay
+        order."""
+        log = FileStorage.__log_path
+        return self.__data_path(), log + ".1", log
+
+    def __records(self, sources):
+        """Chain the (key, record) pairs of sources, skipping the ones
+        whose file does not exist."""
+        for source in sources:
+            try:
+                yield from source
+            except FileNotFoundError:
+                pass
+
+    def load(self, cls):
+        """Load the shard of a single class into __objects.
+
+        Args:
+            cls (type or str): The model class or its name.
+        """
+        name = cls if isinstance(cls, str) else cls.__name__
+        path = self.__shard(name)
+        with FileStorage.__lock, self.__flock():
+            FileStorage.__loaded.add(name)
+            self.__hydrate(self.__records((self.__read(path),)), True)
+            self.__stamp(path)
+
+    def __hydrate(self, records, cache=False):
+        """Build and store an object from every (key, record) pair.
+
+        Records are consumed one at a time. A None record removes its
+        key. With cache set, each record is also cached as the current
+        encoding of its object, as it is on disk.
+        """
+        encoded = FileStorage.__encoded
+        for key, o in records:
+            if o is None:
+                self.__remove(key)
+                encoded.pop(key, None)
+            else:
+                if cache:
+                    rec = json.dumps(o, default=datetime.isoformat)
+                cls = classes[o.pop("__class__")]
+                self.__intern_ids(o)
+                obj = cls(**o)
+                self.__store(key, obj)
+                if cache:
+                    encoded[key] = (obj, rec)
+                    self.__track(key, o.values())
+            FileStorage.__dirty.discard(key)
+
+    @contextmanager
+    def __flock(self, exclusive=False):
+        """Hold the lock shared with other processes on the store.
+
+        Nested calls reuse the lock already held, upgrading it to
+        exclusive if asked. Without fcntl only the threads of this
+        process are serialized.
+
+        Args:
+            exclusive (bool): Lock for writing rather than reading.
+        """
+        with FileStorage.__lock:
+            f = FileStorage.__flock_file
+            if fcntl is None or f is not None:
+                if exclusive and f is not None and not FileStorage.__flock_ex:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    FileStorage.__flock_ex = True
+                yield
+                return
+            f = open(FileStorage.__lock_path, "a")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                FileStorage.__flock_file = f
+                FileStorage.__flock_ex = exclusive
+                yield
+            finally:
+                FileStorage.__flock_file = None
+                f.close()
+
+    def __stamp(self, path):
+        """Record the (inode, size, mtime) path has as of now."""
+        if FileStorage.__stamped is not FileStorage.__objects:
+            FileStorage.__stamps = {}
+            FileStorage.__stamped = FileStorage.__objects
+        FileStorage.__stamps[path] = self.__stat(path)
+
+    def __stat(self, path):
+        """Return the (inode, size, mtime) of path, or None."""
+        try:
+            st = os.stat(path)
         except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime_ns
+
+    def __changed(self, path):
+        """Return the (recorded, current) stamps of path if it was
+        written by another process since we last touched it.
+
+        Files that vanished, or that this process never read or wrote
+        for the current __objects, do not count as changed.
+        """
+        if (FileStorage.__stamped is not FileStorage.__objects or
+                path not in FileStorage.__stamps):
+            return None
+        old = FileStorage.__stamps[path]
+        new = self.__stat(path)
+        if new is None or new == old:
+            return None
+        return old, new
+
+    def __merge(self, dirty):
+        """Fold in the changes other processes saved since our last read.
+
+        Objects in dirty keep our version. A journal that only grew is
+        read from where we left off; otherwise each changed file is read
+        again, and stored objects it no longer holds are dropped.
+        """
+        odict = FileStorage.__objects
+        if FileStorage.__sharded and not FileStorage.__journal:
+            for name in {key.split(".", 1)[0] for key in dirty}:
+                path = self.__shard(name)
+                if (self.__changed(path) and (not FileStorage.__pending or
+                                              name in FileStorage.__loaded)):
+                    keys = list(self.__partitions().get(name, {}))
+                    self.__fold(self.__records((self.__read(path),)),
+                                dirty, keys)
+                    self.__stamp(path)
+            return
+        if FileStorage.__pending:
             return
+        if not FileStorage.__journal:
+            path = self.__data_path()
+            if self.__changed(path):
+                self.__fold(self.__records((self.__read(path),)),
+                            dirty, list(odict))
+                self.__stamp(path)
+            return
+        paths = self.__journal_paths()
+        log = paths[2]
+        changed = self.__changed(log)
+        if not any(self.__changed(p) for p in paths[:2]):
+            if changed is None:
+                return
+            old, new = changed
+            if old is None or (old[0] == new[0] and old[1] <= new[1]):
+                self.__fold(self.__records((self.__replay(
+                    log, old[1] if old else 0),)), dirty)
+                self.__stamp(log)
+                return
+        self.__fold(self.__records(
+            (self.__read(paths[0]), self.__replay(paths[1]),
+             self.__replay(paths[2]))), dirty, list(odict))
+        for path in paths:
+            self.__stamp(path)
+
+    def __fold(self, records, dirty, keys=()):
+        """Hydrate the records whose key is not in dirty.
+
+        The objects under keys that are neither dirty nor among the
+        records are deleted.
+        """
+        seen = set()
+
+        def fresh():
+            for key, o in records:
+                seen.add(key)
+                if key not in dirty:
+                    yield key, o
+
+        self.__hydrate(fresh(), True)
+        for key in keys:
+            if key not in seen and key not in dirty:
+                self.__remove(key)
+                FileStorage.__encoded.pop(key, None)
@@ -0,0 +1,198 @@
+#!/usr/bin/python3
+"""Defining the Query class, lazy queries over the objects of storage,
+and the cursors of paginated listings."""
+import binascii
+import operator
+from bisect import bisect_right
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from heapq import nsmallest
+from itertools import islice
+
+lookups = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "in": lambda a, b: a in b,
+    "contains": operator.contains
+}
+
+
+def condition(arg):
+    """Split a where() keyword into its attribute and lookup.
+
+    e.g. "price_by_night__lt" gives ("price_by_night", "lt") and
+    "city_id" gives ("city_id", "eq").
+    """
+    attr, sep, lookup = arg.rpartition("__")
+    if sep and attr and lookup in lookups:
+        return attr, lookup
+    return arg, "eq"
+
+
+def encode_cursor(key):
+    """Return the opaque cursor of the page that starts after key."""
+    return urlsafe_b64encode(key.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Return the key a cursor starts after, or None if cursor is None.
+
+    Raises:
+        ValueError: If cursor was not made by encode_cursor().
+    """
+    if cursor is None:
+        return None
+    try:
+        key = urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+    except (binascii.Error, UnicodeError):
+        raise ValueError("invalid cursor: {!r}".format(cursor)) from None
+    if "." not in key:
+        raise ValueError("invalid cursor: {!r}".format(cursor))
+    return key
+
+
+def page_keys(keys, start, limit):
+    """Return the first limit keys greater than start, in order, and the
+    cursor of the next page, or None if there is none.
+
+    Only limit + 1 keys are held at a time, however many keys there
+    are. start may be None to begin with the first key.
+
+    Raises:
+        ValueError: If limit is less than 1.
+    """
+    if limit < 1:
+        raise ValueError("page size must be at least 1")
+    if start is not None:
+        keys = (k for k in keys if k > start)
+    keys = nsmallest(limit + 1, keys)
+    if len(keys) > limit:
+        return keys[:limit], encode_cursor(keys[limit - 1])
+    return keys, None
+
+
+def page_sorted(keys, start, limit):
+    """Return the same page as page_keys() from a sorted list of keys.
+
+    The page is found by bisection, in O(log n + limit) time.
+
+    Raises:
+        ValueError: If limit is less than 1.
+    """
+    if limit < 1:
+        raise ValueError("page size must be at least 1")
+    i = 0 if start is None else bisect_right(keys, start)
+    page = keys[i:i + limit]
+    if i + limit < len(keys):
+        return page, encode_cursor(page[-1])
+    return page, None
+
+
+class Query:
+    """Represents a query over the objects of one model class.
+
+    A Query is built by chaining where(), only() and limit(), each of
+    which returns a new Query, and runs when iterated over: objects are
+    tested one at a time and iteration stops once the limit is reached.
+    An equality condition on id or on an attribute the storage indexes
+    (see its indexed() method) narrows the objects tested down to the
+    ones it finds; every other condition is checked on each object.
+    Results come in storage order, or in index order when an index is
+    used.
+
+    Objects of the class must not be added to or removed from storage
+    while a query over it is being iterated.
+
+    Attributes:
+        __storage (FileStorage or DBStorage): The storage queried.
+        __cls (type or str): The model class or its name.
+        __conds (tuple): The (attribute, lookup, value) conditions.
+        __fields (tuple): The projected attributes, if any.
+        __limit (int): The maximum number of results, if any.
+    """
+
+    def __init__(self, storage, cls, conds=(), fields=None, limit=None):
+        """Initialize a new Query.
+
+        Args:
+            storage (FileStorage or DBStorage): The storage queried.
+            cls (type or str): The model class or its name.
+        """
+        self.__storage = storage
+        self.__cls = cls
+        self.__conds = conds
+        self.__fields = fields
+        self.__limit = limit
+
+    def __copy(self, **kwargs):
+        """Return a copy of the query with some attributes replaced."""
+        args = {"conds": self.__conds, "fields": self.__fields,
+                "limit": self.__limit}
+        args.update(kwargs)
+        return Query(self.__storage, self.__cls, **args)
+
+    def where(self, **kwargs):
+        """Return the query restricted to objects matching every
+        condition.
+
+        Keywords are attribute names, optionally followed by a double
+        underscore and one of the lookups: eq (the default), ne, lt,
+        lte, gt, gte, in or contains. An object lacking the attribute
+        or whose value cannot be compared does not match.
+
+        e.g. where(price_by_night__lt=100, city_id="1234")
+        """
+        conds = tuple((*condition(k), v) for k, v in kwargs.items())
+        return self.__copy(conds=self.__conds + conds)
+
+    def only(self, *fields):
+        """Return the query yielding a dict of the given attributes of
+        each object instead of the object.
+
+        Attributes an object lacks are left out of its dict.
+        """
+        return self.__copy(fields=fields)
+
+    def limit(self, n):
+        """Return the query stopping after n results."""
+        if n < 0:
+            raise ValueError("limit must not be negative")
+        return self.__copy(limit=n)
+
+    def __candidates(self):
+        """Return the objects worth testing, using an index if a
+        condition allows it."""
+        indexed = self.__storage.indexed(self.__cls)
+        for attr, lookup, value in self.__conds:
+            if lookup != "eq":
+                continue
+            if attr == "id":
+                obj = self.__storage.get(self.__cls, value)
+                return [] if obj is None else [obj]
+            if attr in indexed:
+                return self.__storage.by_attr(
+                    self.__cls, attr, value).values()
+        return self.__storage.all(self.__cls).values()
+
+    def __match(self, obj):
+        """Return True if obj meets every condition."""
+        for attr, lookup, value in self.__conds:
+            try:
+                if not lookups[lookup](getattr(obj, attr), value):
+                    return False
+            except (AttributeError, TypeError):
+                return False
+        return True
+
+    def __iter__(self):
+        results = (obj for obj in self.__candidates() if self.__match(obj))
+        if self.__limit is not None:
+            results = islice(results, self.__limit)
+        if self.__fields is None:
+            return iter(results)
+        fields = self.__fields
+        return ({f: getattr(obj, f) for f in fields if hasattr(obj, f)}
+                for obj in results)
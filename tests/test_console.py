@@ -6,15 +6,25 @@ Unittest classes:
     TestHBNBCommand_help
     TestHBNBCommand_exit
     TestHBNBCommand_create
+    TestHBNBCommand_create_many
     TestHBNBCommand_show
     TestHBNBCommand_all
     TestHBNBCommand_destroy
     TestHBNBCommand_update
+    TestHBNBCommand_count
+    TestHBNBCommand_where
+    TestHBNBCommand_transaction
 """
 import os
+import ast
 import sys
 import unittest
 from models import storage
+from models.base_model import BaseModel, registry
+from models.place import Place
+from models.city import City
+from models.state import State
+from models.user import User
 from models.engine.file_storage import FileStorage
 from console import HBNBCommand
 from io import StringIO
@@ -74,7 +84,9 @@ class TestHBNBCommand_help(unittest.TestCase):
         h = ("Usage: all or all <class> or <class>.all()\n        "
              "Display string representations of all instances of a given class"
              ".\n        If no class is specified, displays all instantiated "
-             "objects.")
+             "objects.\n        With [--limit <count>] [--after <cursor>], "
+             "displays one page of\n        them ordered by key, then the "
+             "cursor of the next page if any.")
         with patch("sys.stdout", new=StringIO()) as output:
             self.assertFalse(HBNBCommand().onecmd("help all"))
             self.assertEqual(h, output.getvalue().strip())
@@ -96,10 +108,41 @@ class TestHBNBCommand_help(unittest.TestCase):
             self.assertFalse(HBNBCommand().onecmd("help update"))
             self.assertEqual(h, output.getvalue().strip())
 
+    def test_help_begin(self):
+        h = ("Usage: begin\n        "
+             "Start a transaction: changes are only saved on commit.")
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("help begin"))
+            self.assertEqual(h, output.getvalue().strip())
+
+    def test_help_create_many(self):
+        h = ("Usage: create_many <class> <count> or create_many <class> "
+             "<file>\n        "
+             "Create instances in bulk, saved once, and print their ids.\n"
+             "        A file holds one JSON dictionary of attributes per "
+             "line; none\n        is created if a line is invalid or sets "
+             "an id already used.")
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("help create_many"))
+            self.assertEqual(h, output.getvalue().strip())
+
+    def test_help_where(self):
+        h = ("Usage: where <class> [<attribute>[__<lookup>]=<value> ...]\n"
+             "       [--only <attribute>,...] [--limit <count>] or\n"
+             "       <class>.where(<attribute>[__<lookup>]=<value>, ...)\n"
+             "        Display the instances of a class matching every "
+             "condition.\n        Lookups are eq, ne, lt, lte, gt, gte, "
+             "contains and in, whose\n        values are separated by "
+             "commas.")
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("help where"))
+            self.assertEqual(h, output.getvalue().strip())
+
     def test_help(self):
         h = ("Documented commands (type help <topic>):\n"
              "========================================\n"
-             "EOF  all  count  create  destroy  help  quit  show  update")
+             "EOF  begin   count   create_many  help  rollback  update\n"
+             "all  commit  create  destroy      quit  show      where")
         with patch("sys.stdout", new=StringIO()) as output:
             self.assertFalse(HBNBCommand().onecmd("help"))
             self.assertEqual(h, output.getvalue().strip())
@@ -198,6 +241,108 @@ class TestHBNBCommand_create(unittest.TestCase):
             testKey = "Review.{}".format(output.getvalue().strip())
             self.assertIn(testKey, storage.all().keys())
 
+    def test_create_registered_class(self):
+        class Boat(BaseModel):
+            name = ""
+        self.addCleanup(registry.pop, "Boat")
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("create Boat"))
+            testKey = "Boat.{}".format(output.getvalue().strip())
+            self.assertIn(testKey, storage.all().keys())
+
+
+class TestHBNBCommand_create_many(unittest.TestCase):
+    """Unittests for testing create_many from the HBNB command
+    interpreter."""
+
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        for name in ("file.json", "test_rows.jsonl"):
+            try:
+                os.remove(name)
+            except IOError:
+                pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+
+    def test_create_many_missing_class(self):
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("create_many"))
+            self.assertEqual("** class name missing **",
+                             output.getvalue().strip())
+
+    def test_create_many_invalid_class(self):
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("create_many MyModel 2"))
+            self.assertEqual("** class doesn't exist **",
+                             output.getvalue().strip())
+
+    def test_create_many_missing_count(self):
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("create_many User"))
+            self.assertEqual("** count or file missing **",
+                             output.getvalue().strip())
+
+    def test_create_many_missing_file(self):
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd(
+                "create_many User test_rows.jsonl"))
+            self.assertEqual("** file doesn't exist **",
+                             output.getvalue().strip())
+
+    def test_create_many_count(self):
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("create_many City 3"))
+            ids = output.getvalue().split()
+        self.assertEqual(3, len(set(ids)))
+        with open("file.json", "r") as f:
+            text = f.read()
+        for testId in ids:
+            self.assertIn("City.{}".format(testId), storage.all())
+            self.assertIn("City.{}".format(testId), text)
+
+    def test_create_many_file(self):
+        with open("test_rows.jsonl", "w") as f:
+            f.write('{"name": "California"}\n\n{"name": "Arizona"}\n')
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd(
+                "create_many State test_rows.jsonl"))
+            ids = output.getvalue().split()
+        names = [storage.get("State", i).name for i in ids]
+        self.assertEqual(["California", "Arizona"], names)
+
+    def test_create_many_invalid_line(self):
+        with open("test_rows.jsonl", "w") as f:
+            f.write('{"name": "California"}\n["Arizona"]\n')
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd(
+                "create_many State test_rows.jsonl"))
+            self.assertEqual("** invalid attributes on line 2 **",
+                             output.getvalue().strip())
+        self.assertEqual({}, storage.all("State"))
+
+    def test_create_many_invalid_values(self):
+        st = State()
+        for row in ('{"created_at": "yesterday"}', '{"id": 5}',
+                    '{"id": "%s"}' % st.id, '{"id": "1234"}'):
+            with open("test_rows.jsonl", "w") as f:
+                f.write('{"id": "1234"}\n\n' + row + '\n')
+            with patch("sys.stdout", new=StringIO()) as output:
+                self.assertFalse(HBNBCommand().onecmd(
+                    "create_many State test_rows.jsonl"))
+                self.assertEqual("** invalid attributes on line 3 **",
+                                 output.getvalue().strip())
+            self.assertEqual(["State." + st.id], list(storage.all("State")))
+            self.assertNotIn("State.1234", FileStorage._FileStorage__dirty)
+
 
 class TestHBNBCommand_show(unittest.TestCase):
     """Unittests for testing show from the HBNB command interpreter"""
@@ -851,6 +996,49 @@ class TestHBNBCommand_all(unittest.TestCase):
             self.assertIn("Review", output.getvalue().strip())
             self.assertNotIn("BaseModel", output.getvalue().strip())
 
+    def test_all_pages(self):
+        FileStorage._FileStorage__objects = {}
+        keys = []
+        for i in range(5):
+            keys.append("City." + City().id)
+        listed = []
+        cursor = ""
+        while True:
+            with patch("sys.stdout", new=StringIO()) as output:
+                self.assertFalse(HBNBCommand().onecmd(
+                    "all City --limit 2" + cursor))
+                lines = output.getvalue().strip().split("\n")
+            page = ast.literal_eval(lines[0])
+            self.assertLessEqual(len(page), 2)
+            listed += ["City." + i.split(") ")[0].split(" (")[1]
+                       for i in page]
+            if len(lines) == 1:
+                break
+            self.assertTrue(lines[1].startswith("next: "))
+            cursor = " --after " + lines[1][6:]
+        self.assertEqual(sorted(keys), listed)
+
+    def test_all_page_without_class(self):
+        FileStorage._FileStorage__objects = {}
+        us = User()
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("all --limit 5"))
+            self.assertEqual(str([str(us)]), output.getvalue().strip())
+
+    def test_all_invalid_page(self):
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("all User --limit 0"))
+            self.assertEqual("** invalid --limit value **",
+                             output.getvalue().strip())
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("all User --after"))
+            self.assertEqual("** invalid --after value **",
+                             output.getvalue().strip())
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("all User --after abc"))
+            self.assertEqual("** invalid cursor **",
+                             output.getvalue().strip())
+
 
 class TestHBNBCommand_update(unittest.TestCase):
     """Unittests for testing update from the HBNB command interpreter."""
@@ -1182,6 +1370,62 @@ class TestHBNBCommand_update(unittest.TestCase):
             self.assertFalse(HBNBCommand().onecmd(testCmd))
             self.assertEqual(correct, output.getvalue().strip())
 
+    def test_update_dict_is_not_evaluated(self):
+        with patch("sys.stdout", new=StringIO()) as output:
+            HBNBCommand().onecmd("create User")
+            testId = output.getvalue().strip()
+        testCmd = "update User {} {{'first_name': str.upper('x')}}".format(
+            testId)
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd(testCmd))
+            self.assertEqual("** value missing **", output.getvalue().strip())
+        self.assertEqual("", storage.get("User", testId).first_name)
+
+    def test_update_reserved_attr(self):
+        with patch("sys.stdout", new=StringIO()) as output:
+            HBNBCommand().onecmd("create User")
+            testId = output.getvalue().strip()
+        for attr in ("__class__", "__dict__", "id", "created_at"):
+            for testCmd in ("update User {} {} x".format(testId, attr),
+                            "User.update({}, {{'{}': 'x', 'first_name': "
+                            "'Betty'}})".format(testId, attr)):
+                correct = "** attribute can't be updated: {} **".format(attr)
+                with patch("sys.stdout", new=StringIO()) as output:
+                    self.assertFalse(HBNBCommand().onecmd(testCmd))
+                    self.assertEqual(correct, output.getvalue().strip())
+        obj = storage.get("User", testId)
+        self.assertIs(User, type(obj))
+        self.assertEqual(testId, obj.id)
+        self.assertEqual("", obj.first_name)
+
+    def test_update_interns_values(self):
+        ids = []
+        for i in range(2):
+            with patch("sys.stdout", new=StringIO()) as output:
+                HBNBCommand().onecmd("create Place")
+                ids.append(output.getvalue().strip())
+            testCmd = "update Place {} city_id '{}'".format(
+                ids[-1], "".join(["12", "34"]))
+            self.assertFalse(HBNBCommand().onecmd(testCmd))
+        objs = storage.all()
+        self.assertIs(objs["Place.{}".format(ids[0])].city_id,
+                      objs["Place.{}".format(ids[1])].city_id)
+
+    def test_update_interns_only_foreign_keys(self):
+        with patch("sys.stdout", new=StringIO()) as output:
+            HBNBCommand().onecmd("create Place")
+            testId = output.getvalue().strip()
+        with patch.object(storage, "intern",
+                          side_effect=lambda v: v) as intern:
+            HBNBCommand().onecmd("update Place {} name Home".format(testId))
+            HBNBCommand().onecmd("update Place {} {{'description': 'Nice', "
+                                 "'amenity_ids': ['a1', 'a2']}}".format(
+                                     testId))
+        self.assertEqual([(("a1",),), (("a2",),)], intern.call_args_list)
+        obj = storage.get("Place", testId)
+        self.assertEqual(["a1", "a2"], obj.amenity_ids)
+        self.assertEqual("Home", obj.name)
+
     def test_update_valid_string_attr_space_notation(self):
         with patch("sys.stdout", new=StringIO()) as output:
             HBNBCommand().onecmd("create BaseModel")
@@ -1566,6 +1810,142 @@ class TestHBNBCommand_count(unittest.TestCase):
             self.assertEqual("1", output.getvalue().strip())
 
 
+class TestHBNBCommand_where(unittest.TestCase):
+    """Unittests for testing where from the HBNB command interpreter."""
+
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+        self.pls = []
+        for price in (50, 150, 80):
+            pl = Place()
+            pl.city_id = "1234"
+            pl.price_by_night = price
+            self.pls.append(pl)
+
+    def tearDown(self):
+        FileStorage._FileStorage__objects = {}
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+
+    def where(self, command):
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd(command))
+            return output.getvalue().strip()
+
+    def test_where_missing_class(self):
+        self.assertEqual("** class name missing **", self.where("where"))
+
+    def test_where_invalid_class(self):
+        self.assertEqual("** class doesn't exist **",
+                         self.where("where MyModel"))
+        self.assertEqual("** class doesn't exist **",
+                         self.where("MyModel.where()"))
+
+    def test_where_invalid_arguments(self):
+        self.assertEqual("** invalid condition: city_id **",
+                         self.where("where Place city_id"))
+        self.assertEqual("** invalid value for price_by_night **",
+                         self.where("where Place price_by_night__lt=low"))
+        self.assertEqual("** invalid --limit value **",
+                         self.where("where Place --limit"))
+        self.assertEqual("** invalid --only value **",
+                         self.where("where Place --only"))
+
+    def test_where_prints_like_all(self):
+        self.assertEqual(self.where("all Place"), self.where("where Place"))
+        self.assertEqual("[]", self.where("where User"))
+
+    def test_where_space_notation(self):
+        output = self.where("where Place price_by_night__lt=100 "
+                            "city_id=1234")
+        self.assertIn(output, (str([str(self.pls[0]), str(self.pls[2])]),
+                               str([str(self.pls[2]), str(self.pls[0])])))
+
+    def test_where_dot_notation(self):
+        output = self.where("Place.where(price_by_night__in=150,80, "
+                            "city_id=1234)")
+        self.assertIn(output, (str([str(self.pls[1]), str(self.pls[2])]),
+                               str([str(self.pls[2]), str(self.pls[1])])))
+
+    def test_where_only_and_limit(self):
+        output = self.where("where Place price_by_night__gt=60 "
+                            "--only id,price_by_night --limit 1")
+        self.assertEqual(str([{"id": self.pls[1].id,
+                               "price_by_night": 150}]), output)
+
+
+class TestHBNBCommand_transaction(unittest.TestCase):
+    """Unittests for testing begin, commit and rollback of HBNB comand
+    interpreter."""
+
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        storage.rollback()
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+
+    def test_commit(self):
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("begin"))
+            self.assertFalse(HBNBCommand().onecmd("create User"))
+            testID = output.getvalue().strip()
+        self.assertFalse(os.path.exists("file.json"))
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("commit"))
+            self.assertEqual("", output.getvalue().strip())
+        with open("file.json", "r") as f:
+            self.assertIn("User." + testID, f.read())
+
+    def test_rollback(self):
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("begin"))
+            self.assertFalse(HBNBCommand().onecmd("create User"))
+            self.assertFalse(HBNBCommand().onecmd("rollback"))
+            self.assertFalse(HBNBCommand().onecmd("User.count()"))
+            self.assertEqual("0", output.getvalue().split()[-1])
+
+    def test_begin_twice(self):
+        correct = "** transaction already in progress **"
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("begin"))
+            self.assertFalse(HBNBCommand().onecmd("begin"))
+            self.assertEqual(correct, output.getvalue().strip())
+
+    def test_commit_without_transaction(self):
+        correct = "** no transaction in progress **"
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("commit"))
+            self.assertEqual(correct, output.getvalue().strip())
+
+    def test_rollback_without_transaction(self):
+        correct = "** no transaction in progress **"
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("rollback"))
+            self.assertEqual(correct, output.getvalue().strip())
+
+
 if __name__ == "__main__":
 
     unittest.main()
@@ -5,13 +5,20 @@ Unittest classes:
     TestBaseModel_instantiation
     TestBaseModel_save
     TestBaseModel_to_dict
+    TestBaseModel_compact
 """
 import os
+import sys
 import models
+import shutil
+import tempfile
 import unittest
+import uuid
+import subprocess
 from datetime import datetime
 from time import sleep
-from models.base_model import BaseModel
+from models.base_model import BaseModel, declared, instances, registry
+from models.city import City
 
 
 class TestBaseModel_instantiation(unittest.TestCase):
@@ -85,6 +92,44 @@ class TestBaseModel_instantiation(unittest.TestCase):
         self.assertEqual(bm.created_at, dt)
         self.assertEqual(bm.updated_at, dt)
 
+    def test_instantiation_with_whole_second_kwargs(self):
+        dt = datetime(2017, 9, 28, 21, 5, 54)
+        bm = BaseModel(id="345", created_at=dt.isoformat(),
+                       updated_at=dt.isoformat())
+        self.assertEqual(bm.created_at, dt)
+        self.assertEqual(bm.updated_at, dt)
+        bmdict = bm.to_dict()
+        del bmdict["__class__"]
+        self.assertEqual(bm.to_dict(), BaseModel(**bmdict).to_dict())
+
+    def test_instantiation_with_bad_date_kwargs(self):
+        with self.assertRaises(ValueError):
+            BaseModel(id="345", created_at="yesterday")
+
+    def test_instantiation_with_partial_kwargs(self):
+        bm = BaseModel(name="Holberton")
+        self.assertEqual(str, type(bm.id))
+        self.assertEqual(datetime, type(bm.created_at))
+        self.assertEqual("Holberton", bm.name)
+        self.assertNotIn(bm, models.storage.all().values())
+
+    def test_instances(self):
+        cys = list(instances(City, [{"name": "Fremont"}, {}], batch=1))
+        self.assertEqual(2, len({cy.id for cy in cys}))
+        self.assertEqual("Fremont", cys[0].name)
+        self.assertEqual(cys[0].created_at, cys[1].updated_at)
+        for cy in cys:
+            self.assertEqual(4, uuid.UUID(cy.id).version)
+            self.assertNotIn(cy, models.storage.all().values())
+
+    def test_subclasses_are_registered(self):
+        class Boat(BaseModel):
+            name = ""
+        self.addCleanup(registry.pop, "Boat")
+        self.assertIs(BaseModel, registry["BaseModel"])
+        self.assertIs(City, registry["City"])
+        self.assertIs(Boat, registry["Boat"])
+
 
 class TestBaseModel_save(unittest.TestCase):
     """Unittests for testing save method of the BaseModel class."""
@@ -187,6 +232,116 @@ class TestBaseModel_to_dict(unittest.TestCase):
         with self.assertRaises(TypeError):
             bm.to_dict(None)
 
+    def test_to_dict_returns_copies(self):
+        bm = BaseModel()
+        bm_dict = bm.to_dict()
+        bm_dict["name"] = "Holberton"
+        self.assertNotIn("name", bm.to_dict())
+        self.assertIsNot(bm.to_dict(), bm.to_dict())
+
+    def test_to_dict_follows_changes(self):
+        bm = BaseModel()
+        bm.to_dict()
+        bm.name = "Holberton"
+        self.assertEqual("Holberton", bm.to_dict()["name"])
+        del bm.name
+        self.assertNotIn("name", bm.to_dict())
+        bm.save()
+        self.assertEqual(bm.updated_at.isoformat(),
+                         bm.to_dict()["updated_at"])
+
+    def test_str_follows_changes(self):
+        bm = BaseModel()
+        str(bm)
+        bm.name = "Holberton"
+        self.assertIn("'name': 'Holberton'", str(bm))
+        bm.__dict__["name"] = "Betty"
+        self.assertIn("'name': 'Betty'", str(bm))
+        self.assertEqual("Betty", bm.to_dict()["name"])
+
+    def test_in_place_changes_show_everywhere(self):
+        bm = BaseModel()
+        bm.amenity_ids = []
+        str(bm)
+        bm.to_dict()
+        bm.amenity_ids.append("1234")
+        self.assertEqual(["1234"], bm.to_dict()["amenity_ids"])
+        self.assertIn("'amenity_ids': ['1234']", str(bm))
+
+
+class TestBaseModel_compact(unittest.TestCase):
+    """Unittests for testing the slot-based compact representation.
+
+    Compact mode is chosen when models are imported, so it is checked
+    in a fresh interpreter, run in a scratch directory.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def run_compact(self, code):
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        env = dict(os.environ, HBNB_COMPACT_MODELS="1", PYTHONPATH=root)
+        proc = subprocess.run([sys.executable, "-c", code], cwd=self.dir,
+                              env=env, stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT,
+                              universal_newlines=True)
+        self.assertEqual(0, proc.returncode, proc.stdout)
+
+    def test_declared(self):
+        self.assertEqual({"state_id": "", "name": ""},
+                         declared(City))
+        self.assertEqual({}, declared(BaseModel))
+
+    def test_instances_have_no_dict(self):
+        self.run_compact(
+            "from models.place import Place\n"
+            "pl = Place()\n"
+            "assert type(pl).__dictoffset__ == 0\n"
+            "assert Place.name == '' and pl.name == ''\n"
+            "assert pl.amenity_ids == []\n")
+
+    def test_attributes_and_extras(self):
+        self.run_compact(
+            "from models.place import Place\n"
+            "pl = Place()\n"
+            "pl.name = 'Home'\n"
+            "pl.pool = True\n"
+            "assert pl.pool is True and pl.__dict__['pool'] is True\n"
+            "assert list(pl.__dict__) == ['id', 'created_at', "
+            "'updated_at', 'name', 'pool']\n"
+            "d = pl.to_dict()\n"
+            "assert d['name'] == 'Home' and d['pool'] is True\n"
+            "assert 'city_id' not in d\n"
+            "assert pl.__dict__.copy() == dict(pl.__dict__.items())\n"
+            "assert str(pl).startswith('[Place] (' + pl.id + ') {')\n"
+            "del pl.pool\n"
+            "assert not hasattr(pl, 'pool')\n"
+            "try:\n"
+            "    pl.nothing\n"
+            "except AttributeError:\n"
+            "    pass\n"
+            "else:\n"
+            "    raise AssertionError\n")
+
+    def test_storage_round_trip(self):
+        self.run_compact(
+            "import models\n"
+            "from models.place import Place\n"
+            "from models.engine.file_storage import FileStorage\n"
+            "pl = Place()\n"
+            "pl.city_id = '1234'\n"
+            "pl.pool = True\n"
+            "pl.save()\n"
+            "FileStorage._FileStorage__objects = {}\n"
+            "models.storage.reload()\n"
+            "obj = models.storage.all()['Place.' + pl.id]\n"
+            "assert obj is not pl and obj.to_dict() == pl.to_dict()\n")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,130 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/codec.py.
+
+Unittest classes:
+    TestCodec_schema
+    TestCodec_round_trip
+    TestCodec_converters
+"""
+import io
+import os
+import json
+import unittest
+from datetime import datetime
+from models.engine import codec
+from models.engine.file_storage import classes
+from models.base_model import BaseModel
+from models.city import City
+from models.place import Place
+
+
+class TestCodec_schema(unittest.TestCase):
+    """Unittests for testing schemas derived from model classes."""
+
+    def test_base_model_schema(self):
+        self.assertEqual(["id", "created_at", "updated_at"],
+                         codec.schema(BaseModel))
+
+    def test_city_schema(self):
+        self.assertEqual(["id", "created_at", "updated_at",
+                          "state_id", "name"], codec.schema(City))
+
+    def test_place_schema_includes_every_declared_attribute(self):
+        fields = codec.schema(Place)
+        for k in ("city_id", "number_rooms", "latitude", "amenity_ids"):
+            self.assertIn(k, fields)
+
+
+class TestCodec_round_trip(unittest.TestCase):
+    """Unittests for testing encoding and decoding of records."""
+
+    def round_trip(self, *recs):
+        f = io.BytesIO()
+        enc = codec.Encoder(f, classes)
+        for rec in recs:
+            enc.write(rec)
+        f.seek(0)
+        return list(codec.load(f))
+
+    def test_round_trip(self):
+        pl = Place()
+        pl.city_id = "1234"
+        pl.number_rooms = 3
+        pl.latitude = 37.77
+        pl.amenity_ids = ["a", "b"]
+        pl.pool = True
+        rec, = self.round_trip(pl.to_dict())
+        self.assertEqual("Place", rec["__class__"])
+        self.assertEqual(pl.id, rec["id"])
+        self.assertEqual(pl.created_at, rec["created_at"])
+        self.assertEqual(pl.updated_at, rec["updated_at"])
+        self.assertEqual("1234", rec["city_id"])
+        self.assertEqual(3, rec["number_rooms"])
+        self.assertEqual(37.77, rec["latitude"])
+        self.assertEqual(["a", "b"], rec["amenity_ids"])
+        self.assertIs(True, rec["pool"])
+        self.assertNotIn("name", rec)
+
+    def test_records_rebuild_objects(self):
+        cy = City()
+        cy.state_id = "1234"
+        rec, = self.round_trip(cy.to_dict())
+        del rec["__class__"]
+        obj = City(**rec)
+        self.assertEqual(cy.to_dict(), obj.to_dict())
+
+    def test_repeated_strings_are_shared(self):
+        cy1 = City()
+        cy1.state_id = "1234"
+        cy2 = City()
+        cy2.state_id = "1234"
+        rec1, rec2 = self.round_trip(cy1.to_dict(), cy2.to_dict())
+        self.assertIs(rec1["state_id"], rec2["state_id"])
+
+    def test_unknown_class(self):
+        rec = BaseModel().to_dict()
+        rec["__class__"] = "MyModel"
+        self.assertEqual(rec["id"], self.round_trip(rec)[0]["id"])
+
+    def test_smaller_than_json(self):
+        recs = []
+        for i in range(100):
+            cy = City()
+            cy.state_id = "1234"
+            cy.name = "San Francisco"
+            recs.append(cy.to_dict())
+        f = io.BytesIO()
+        enc = codec.Encoder(f, classes)
+        for rec in recs:
+            enc.write(rec)
+        self.assertLess(len(f.getvalue()), len(json.dumps(recs)) / 2)
+
+    def test_bad_magic(self):
+        with self.assertRaises(ValueError):
+            list(codec.load(io.BytesIO(b"{}")))
+
+
+class TestCodec_converters(unittest.TestCase):
+    """Unittests for testing the JSON converters."""
+
+    def tearDown(self):
+        for name in ("test_codec.json", "test_codec.bin", "test_codec2.json"):
+            try:
+                os.remove(name)
+            except IOError:
+                pass
+
+    def test_json_binary_json(self):
+        cy = City()
+        cy.state_id = "1234"
+        objdict = {"City." + cy.id: cy.to_dict()}
+        with open("test_codec.json", "w") as f:
+            json.dump(objdict, f)
+        codec.json_to_binary("test_codec.json", "test_codec.bin", classes)
+        codec.binary_to_json("test_codec.bin", "test_codec2.json")
+        with open("test_codec2.json", "r") as f:
+            self.assertEqual(objdict, json.load(f))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/columnar.py.
+
+Unittest classes:
+    TestColumns
+"""
+import unittest
+from math import isnan
+from models.engine.columnar import Columns
+from models.place import Place
+
+
+class TestColumns(unittest.TestCase):
+    """Unittests for testing the Columns class."""
+
+    def setUp(self):
+        self.cols = Columns({"max_guest": int, "latitude": float,
+                             "name": str})
+        for i, (guests, lat) in enumerate([(2, 1.5), (4, 2.5), (6, 3.5)]):
+            pl = Place()
+            pl.max_guest = guests
+            pl.latitude = lat
+            self.cols.set("Place.{}".format(i), pl)
+
+    def test_only_numeric_fields(self):
+        self.assertEqual({"max_guest": int, "latitude": float},
+                         self.cols.fields)
+        self.assertEqual("q", self.cols.column("max_guest").typecode)
+        self.assertEqual("d", self.cols.column("latitude").typecode)
+
+    def test_set_and_update(self):
+        self.assertEqual(3, len(self.cols))
+        pl = Place()
+        pl.max_guest = 10
+        self.cols.set("Place.1", pl)
+        self.assertEqual([2, 10, 6], list(self.cols.column("max_guest")))
+        self.assertEqual(0.0, self.cols.column("latitude")[1])
+
+    def test_discard_moves_last_row(self):
+        self.cols.discard("Place.0")
+        self.assertEqual(["Place.2", "Place.1"], self.cols.keys)
+        self.assertEqual([6, 4], list(self.cols.column("max_guest")))
+        self.cols.discard("Place.1")
+        self.cols.discard("Place.1")
+        self.assertEqual(["Place.2"], self.cols.keys)
+        self.assertEqual([3.5], list(self.cols.column("latitude")))
+
+    def test_bad_values(self):
+        pl = Place()
+        pl.max_guest = "many"
+        pl.latitude = "north"
+        self.cols.set("Place.3", pl)
+        self.assertEqual(0, self.cols.column("max_guest")[3])
+        self.assertTrue(isnan(self.cols.column("latitude")[3]))
+        self.assertEqual(2.5, self.cols.aggregate("mean", "latitude"))
+
+    def test_select(self):
+        self.assertEqual(["Place.1", "Place.2"],
+                         self.cols.select([("max_guest", ">=", 4)]))
+        self.assertEqual(["Place.1"],
+                         self.cols.select([("max_guest", ">=", 4),
+                                           ("latitude", "<", 3)]))
+
+    def test_aggregate(self):
+        where = [("max_guest", ">=", 4)]
+        self.assertEqual(2, self.cols.aggregate("count", where=where))
+        self.assertEqual(10, self.cols.aggregate("sum", "max_guest", where))
+        self.assertEqual(3.0, self.cols.aggregate("mean", "latitude", where))
+        self.assertEqual(4, self.cols.aggregate("min", "max_guest", where))
+        self.assertEqual(3.5, self.cols.aggregate("max", "latitude", where))
+
+    def test_aggregate_no_rows(self):
+        where = [("max_guest", ">", 100)]
+        self.assertEqual(0, self.cols.aggregate("count", where=where))
+        self.assertEqual(0, self.cols.aggregate("sum", "max_guest", where))
+        self.assertIsNone(self.cols.aggregate("mean", "max_guest", where))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,249 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/db_storage.py.
+
+Unittest classes:
+    TestDBStorage_instantiation
+    TestDBStorage_methods
+"""
+import os
+import models
+import sqlite3
+import unittest
+from unittest.mock import patch
+from models.base_model import BaseModel, registry
+from models.engine.db_storage import DBStorage
+from models.user import User
+from models.state import State
+from models.city import City
+from models.place import Place
+from models.review import Review
+
+
+class TestDBStorage_instantiation(unittest.TestCase):
+    """Unittests for testing instantiation of the DBStorage class."""
+
+    def test_DBStorage_instantiation_no_args(self):
+        self.assertEqual(type(DBStorage()), DBStorage)
+
+    def test_DBStorage_instantiation_with_arg(self):
+        with self.assertRaises(TypeError):
+            DBStorage(None)
+
+    def test_db_path_from_env(self):
+        with patch.dict(os.environ, {"HBNB_DB_PATH": "test.db"}):
+            self.assertEqual("test.db", DBStorage()._DBStorage__db_path)
+
+
+class TestDBStorage_methods(unittest.TestCase):
+    """Unittests for testing methods of the DBStorage class."""
+
+    def setUp(self):
+        with patch.dict(os.environ, {"HBNB_DB_PATH": "test_hbnb.db"}):
+            self.db = DBStorage()
+        self.db.reload()
+        self.patcher = patch("models.storage", self.db)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.db.close()
+        try:
+            os.remove("test_hbnb.db")
+        except IOError:
+            pass
+
+    def reopen(self):
+        self.db.close()
+        self.db.reload()
+
+    def test_reload_creates_tables_and_indexes(self):
+        conn = sqlite3.connect("test_hbnb.db")
+        names = {r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master")}
+        conn.close()
+        for table in ("User", "State", "City", "Place", "Review"):
+            self.assertIn(table, names)
+        self.assertIn("ix_City_state_id", names)
+        self.assertIn("ix_Place_city_id", names)
+        self.assertIn("ix_Review_place_id", names)
+
+    def test_new_and_all(self):
+        us = User()
+        self.assertIn("User." + us.id, self.db.all())
+
+    def test_save_and_get(self):
+        cy = City()
+        cy.state_id = "1234"
+        cy.name = "San Francisco"
+        self.db.save()
+        self.reopen()
+        obj = self.db.get(City, cy.id)
+        self.assertEqual(cy.id, obj.id)
+        self.assertEqual("1234", obj.state_id)
+        self.assertEqual(cy.created_at, obj.created_at)
+        self.assertEqual(["City." + cy.id], list(self.db.all()))
+
+    def test_save_round_trips_types_and_extras(self):
+        pl = Place()
+        pl.number_rooms = 3
+        pl.latitude = 37.77
+        pl.amenity_ids = ["a", "b"]
+        pl.pool = "yes"
+        self.db.save()
+        self.reopen()
+        obj = self.db.get("Place", pl.id)
+        self.assertEqual(3, obj.number_rooms)
+        self.assertEqual(37.77, obj.latitude)
+        self.assertEqual(["a", "b"], obj.amenity_ids)
+        self.assertEqual("yes", obj.pool)
+
+    def test_save_writes_only_dirty_rows(self):
+        st = State()
+        self.db.save()
+        with patch.object(State, "to_dict") as to_dict:
+            self.db.save()
+        to_dict.assert_not_called()
+
+    def test_delete(self):
+        rv = Review()
+        self.db.save()
+        self.db.delete(rv)
+        self.assertIsNone(self.db.get(Review, rv.id))
+        self.db.save()
+        self.reopen()
+        self.assertIsNone(self.db.get(Review, rv.id))
+
+    def test_all_with_class(self):
+        us = User()
+        st = State()
+        self.db.save()
+        self.reopen()
+        self.assertEqual(["User." + us.id], list(self.db.all(User)))
+        self.assertEqual(["State." + st.id], list(self.db.all("State")))
+
+    def test_by_attr(self):
+        cy1 = City()
+        cy1.state_id = "1234"
+        cy2 = City()
+        cy2.state_id = "5678"
+        self.db.save()
+        self.reopen()
+        self.assertEqual(["City." + cy1.id],
+                         list(self.db.by_attr(City, "state_id", "1234")))
+
+    def test_by_attr_sees_unsaved_changes(self):
+        cy = City()
+        cy.state_id = "1234"
+        self.db.save()
+        cy.state_id = "5678"
+        self.assertEqual({}, self.db.by_attr(City, "state_id", "1234"))
+        self.assertIn("City." + cy.id,
+                      self.db.by_attr(City, "state_id", "5678"))
+
+    def test_registered_class_gets_a_table(self):
+        class Boat(BaseModel):
+            name = ""
+        self.addCleanup(registry.pop, "Boat")
+        bt = Boat()
+        bt.name = "Titanic"
+        self.db.save()
+        self.reopen()
+        obj = self.db.get("Boat", bt.id)
+        self.assertIs(Boat, type(obj))
+        self.assertEqual("Titanic", obj.name)
+
+    def test_bulk_create(self):
+        cy1, cy2 = self.db.bulk_create(City, [{"state_id": "1234"},
+                                              {"name": "Fremont"}])
+        self.reopen()
+        self.assertEqual("1234", self.db.get(City, cy1.id).state_id)
+        self.assertEqual("Fremont", self.db.get("City", cy2.id).name)
+
+    def test_bulk_create_rejects_existing_id(self):
+        cy = City()
+        self.db.save()
+        self.reopen()
+        with self.assertRaises(ValueError) as cm:
+            self.db.bulk_create(City, [{}, {"id": cy.id}])
+        self.assertEqual(1, cm.exception.args[1])
+        self.assertEqual(["City." + cy.id], list(self.db.all(City)))
+
+    def test_query(self):
+        pl1 = Place()
+        pl1.city_id = "1234"
+        pl1.price_by_night = 80
+        pl2 = Place()
+        pl2.city_id = "1234"
+        pl2.price_by_night = 120
+        self.db.save()
+        self.reopen()
+        self.assertEqual(("city_id", "user_id"), self.db.indexed(Place))
+        query = self.db.query(Place).where(city_id="1234",
+                                           price_by_night__lt=100)
+        self.assertEqual([{"id": pl1.id}], list(query.only("id")))
+
+    def test_page(self):
+        keys = []
+        for i in range(4):
+            keys += ["User." + User().id, "City." + City().id]
+        self.db.save()
+        self.reopen()
+        us = User()
+        keys.append("User." + us.id)
+        doomed = self.db.get("City", keys[1][5:])
+        self.db.delete(doomed)
+        keys.remove("City." + doomed.id)
+        listed = []
+        cursor = None
+        while True:
+            objs, cursor = self.db.page(None, 2, cursor)
+            listed += ["{}.{}".format(type(o).__name__, o.id) for o in objs]
+            if cursor is None:
+                break
+        self.assertEqual(sorted(keys), listed)
+        objs, cursor = self.db.page("City", 5)
+        self.assertEqual(3, len(objs))
+        self.assertIsNone(cursor)
+
+    def test_get_missing(self):
+        self.assertIsNone(self.db.get(User, "1234"))
+
+    def test_reload_shares_foreign_keys(self):
+        cy1 = City()
+        cy1.state_id = "".join(["12", "34"])
+        cy2 = City()
+        cy2.state_id = "".join(["12", "34"])
+        self.db.save()
+        self.reopen()
+        self.assertIs(self.db.get(City, cy1.id).state_id,
+                      self.db.get(City, cy2.id).state_id)
+
+    def test_transaction_commit(self):
+        with self.db.transaction():
+            cy = City()
+            self.db.save()
+            conn = sqlite3.connect("test_hbnb.db")
+            self.assertEqual(0, conn.execute(
+                'SELECT COUNT(*) FROM "City"').fetchone()[0])
+            conn.close()
+        self.reopen()
+        self.assertIsNotNone(self.db.get(City, cy.id))
+
+    def test_transaction_rollback(self):
+        us = User()
+        us.first_name = "Betty"
+        self.db.save()
+        with self.assertRaises(ValueError):
+            with self.db.transaction():
+                st = State()
+                us.first_name = "John"
+                raise ValueError
+        self.assertIsNone(self.db.get(State, st.id))
+        self.assertEqual("Betty", self.db.get(User, us.id).first_name)
+        self.db.save()
+        self.reopen()
+        self.assertEqual(["User." + us.id], list(self.db.all()))
+
+
+if __name__ == "__main__":
+    unittest.main()
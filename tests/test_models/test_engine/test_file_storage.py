@@ -4,20 +4,50 @@
 Unittest classes:
     TestFileStorage_instantiation
     TestFileStorage_methods
+    TestFileStorage_journal
+    TestFileStorage_dirty
+    TestFileStorage_sharded
+    TestFileStorage_lazy
+    TestFileStorage_binary
+    TestFileStorage_iterjson
+    TestFileStorage_write_behind
+    TestFileStorage_durability
+    TestFileStorage_compaction
+    TestFileStorage_processes
+    TestFileStorage_transaction
+    TestFileStorage_compression
+    TestFileStorage_parallel
+    TestFileStorage_interning
+    TestFileStorage_columns
+    TestFileStorage_bulk_create
+    TestFileStorage_page
 """
+import io
+import gzip
 import os
 import json
+import sys
+import shutil
 import models
 import unittest
+import subprocess
+import tempfile
+from unittest.mock import patch
 from datetime import datetime
-from models.base_model import BaseModel
-from models.engine.file_storage import FileStorage
+from time import monotonic, sleep
+from models.base_model import BaseModel, registry
+from models.engine.file_storage import FileStorage, iterjson, openfile
+from models.engine.file_storage import choice, load_range
 from models.user import User
 from models.state import State
 from models.place import Place
 from models.city import City
 from models.amenity import Amenity
 from models.review import Review
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 
 class TestFileStorage_instantiation(unittest.TestCase):
@@ -65,9 +95,27 @@ class TestFileStorage_methods(unittest.TestCase):
     def test_all(self):
         self.assertEqual(dict, type(models.storage.all()))
 
-    def test_all_with_arg(self):
-        with self.assertRaises(TypeError):
-            models.storage.all(None)
+    def test_all_with_None(self):
+        self.assertIs(models.storage.all(), models.storage.all(None))
+
+    def test_all_with_class(self):
+        us = User()
+        st = State()
+        self.assertEqual({"User." + us.id: us}, models.storage.all(User))
+        self.assertEqual({"State." + st.id: st}, models.storage.all("State"))
+
+    def test_all_with_class_none_stored(self):
+        self.assertEqual({}, models.storage.all(Review))
+
+    def test_all_with_class_after_delete(self):
+        us = User()
+        models.storage.delete(us)
+        self.assertEqual({}, models.storage.all(User))
+
+    def test_all_with_class_after_objects_replaced(self):
+        User()
+        FileStorage._FileStorage__objects = {}
+        self.assertEqual({}, models.storage.all(User))
 
     def test_new(self):
         bm = BaseModel()
@@ -160,10 +208,1485 @@ class TestFileStorage_methods(unittest.TestCase):
         self.assertIn("Amenity." + am.id, objs)
         self.assertIn("Review." + rv.id, objs)
 
+    def test_reload_registered_class(self):
+        class Boat(BaseModel):
+            name = ""
+        self.addCleanup(registry.pop, "Boat")
+        bt = Boat()
+        bt.name = "Titanic"
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        obj = models.storage.get("Boat", bt.id)
+        self.assertIs(Boat, type(obj))
+        self.assertEqual("Titanic", obj.name)
+
     def test_reload_with_arg(self):
         with self.assertRaises(TypeError):
             models.storage.reload(None)
 
+    def test_by_attr(self):
+        cy1 = City()
+        cy1.state_id = "1234"
+        cy2 = City()
+        cy2.state_id = "5678"
+        self.assertEqual({"City." + cy1.id: cy1},
+                         models.storage.by_attr(City, "state_id", "1234"))
+
+    def test_by_attr_follows_updates(self):
+        rv = Review()
+        rv.place_id = "1234"
+        self.assertIn("Review." + rv.id,
+                      models.storage.by_attr(Review, "place_id", "1234"))
+        rv.place_id = "5678"
+        self.assertEqual({},
+                         models.storage.by_attr(Review, "place_id", "1234"))
+        self.assertIn("Review." + rv.id,
+                      models.storage.by_attr(Review, "place_id", "5678"))
+
+    def test_by_attr_follows_new_and_delete(self):
+        models.storage.by_attr(Place, "city_id", "1234")
+        pl = Place()
+        pl.city_id = "1234"
+        self.assertIn("Place." + pl.id,
+                      models.storage.by_attr(Place, "city_id", "1234"))
+        models.storage.delete(pl)
+        self.assertEqual({}, models.storage.by_attr(Place, "city_id", "1234"))
+
+    def test_by_attr_after_reload(self):
+        cy = City()
+        cy.state_id = "1234"
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        self.assertIn("City." + cy.id,
+                      models.storage.by_attr(City, "state_id", "1234"))
+
+    def test_by_attr_unindexed_attribute(self):
+        us = User()
+        us.email = "betty@holberton.io"
+        self.assertEqual({"User." + us.id: us}, models.storage.by_attr(
+            User, "email", "betty@holberton.io"))
+
+    def test_get(self):
+        us = User()
+        self.assertIs(us, models.storage.get(User, us.id))
+        self.assertIs(us, models.storage.get("User", us.id))
+
+    def test_get_missing(self):
+        self.assertIsNone(models.storage.get(User, "1234"))
+
+
+class TestFileStorage_journal(unittest.TestCase):
+    """Unittests for testing the append-only journal mode."""
+
+    def setUp(self):
+        for name in ("file.json", "file.json.log"):
+            try:
+                os.rename(name, name + ".tmp")
+            except IOError:
+                pass
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__encoded = {}
+        FileStorage._FileStorage__journal = True
+
+    def tearDown(self):
+        FileStorage._FileStorage__journal = False
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__encoded = {}
+        for name in ("file.json", "file.json.log"):
+            try:
+                os.remove(name)
+            except IOError:
+                pass
+            try:
+                os.rename(name + ".tmp", name)
+            except IOError:
+                pass
+
+    def log_lines(self):
+        with open("file.json.log", "r") as f:
+            return [json.loads(line) for line in f]
+
+    def test_save_appends_only_changed_records(self):
+        us = User()
+        st = State()
+        models.storage.save()
+        self.assertEqual(2, len(self.log_lines()))
+        us.first_name = "Betty"
+        models.storage.save()
+        lines = self.log_lines()
+        self.assertEqual(3, len(lines))
+        self.assertEqual("User." + us.id, lines[-1]["key"])
+        self.assertEqual("Betty", lines[-1]["obj"]["first_name"])
+        self.assertFalse(os.path.exists("file.json"))
+
+    def test_save_without_changes_appends_nothing(self):
+        User()
+        models.storage.save()
+        models.storage.save()
+        self.assertEqual(1, len(self.log_lines()))
+
+    def test_delete_appends_tombstone(self):
+        us = User()
+        models.storage.save()
+        models.storage.delete(us)
+        models.storage.save()
+        lines = self.log_lines()
+        self.assertEqual("User." + us.id, lines[-1]["key"])
+        self.assertIsNone(lines[-1]["obj"])
+
+    def test_reload_replays_journal(self):
+        us = User()
+        st = State()
+        models.storage.save()
+        us.first_name = "Betty"
+        models.storage.delete(st)
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        objs = FileStorage._FileStorage__objects
+        self.assertIn("User." + us.id, objs)
+        self.assertNotIn("State." + st.id, objs)
+        self.assertEqual("Betty", objs["User." + us.id].first_name)
+
+    def test_reload_ignores_truncated_last_line(self):
+        us = User()
+        models.storage.save()
+        with open("file.json.log", "a") as f:
+            f.write('{"key": "User.1", "obj": {"id"')
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        self.assertEqual(["User." + us.id], list(models.storage.all()))
+
+
+class TestFileStorage_dirty(unittest.TestCase):
+    """Unittests for testing dirty tracking of saved objects."""
+
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    def test_new_marks_dirty(self):
+        us = User()
+        self.assertIn("User." + us.id, FileStorage._FileStorage__dirty)
+
+    def test_save_clears_dirty(self):
+        User()
+        models.storage.save()
+        self.assertEqual(set(), FileStorage._FileStorage__dirty)
+
+    def test_attribute_mutation_marks_dirty(self):
+        us = User()
+        models.storage.save()
+        us.email = "betty@holberton.io"
+        self.assertIn("User." + us.id, FileStorage._FileStorage__dirty)
+
+    def test_unstored_object_not_marked(self):
+        us = User(id="1234")
+        us.email = "betty@holberton.io"
+        self.assertNotIn("User.1234", FileStorage._FileStorage__dirty)
+
+    def test_save_reencodes_only_dirty_objects(self):
+        us = User()
+        st = State()
+        models.storage.save()
+        us.email = "betty@holberton.io"
+        with patch.object(State, "to_dict") as st_to_dict:
+            models.storage.save()
+        st_to_dict.assert_not_called()
+        with open("file.json", "r") as f:
+            objdict = json.load(f)
+        self.assertEqual("betty@holberton.io",
+                         objdict["User." + us.id]["email"])
+        self.assertIn("State." + st.id, objdict)
+
+    def test_save_keeps_in_place_changes(self):
+        pl = Place()
+        pl.amenity_ids = []
+        models.storage.save()
+        pl.amenity_ids.append("a1")
+        pl.__dict__["name"] = "direct"
+        models.storage.save()
+        with open("file.json", "r") as f:
+            pldict = json.load(f)["Place." + pl.id]
+        self.assertEqual(["a1"], pldict["amenity_ids"])
+        self.assertEqual("direct", pldict["name"])
+
+    def test_save_keeps_in_place_changes_after_reload(self):
+        pl = Place()
+        pl.amenity_ids = ["a1"]
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        pl = models.storage.get(Place, pl.id)
+        pl.amenity_ids.append("a2")
+        models.storage.save()
+        with open("file.json", "r") as f:
+            pldict = json.load(f)["Place." + pl.id]
+        self.assertEqual(["a1", "a2"], pldict["amenity_ids"])
+
+    def test_save_drops_deleted_objects(self):
+        us = User()
+        models.storage.save()
+        models.storage.delete(us)
+        models.storage.save()
+        with open("file.json", "r") as f:
+            self.assertNotIn("User." + us.id, f.read())
+
+
+class TestFileStorage_sharded(unittest.TestCase):
+    """Unittests for testing the per-class sharded layout."""
+
+    def setUp(self):
+        try:
+            os.rename("file.json.d", "file.json.d.tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__sharded = True
+
+    def tearDown(self):
+        FileStorage._FileStorage__sharded = False
+        FileStorage._FileStorage__objects = {}
+        shutil.rmtree("file.json.d", ignore_errors=True)
+        try:
+            os.rename("file.json.d.tmp", "file.json.d")
+        except IOError:
+            pass
+
+    def test_save_writes_one_file_per_class(self):
+        us = User()
+        pl = Place()
+        models.storage.save()
+        self.assertEqual(["Place.json", "User.json"],
+                         sorted(os.listdir("file.json.d")))
+        with open(os.path.join("file.json.d", "User.json"), "r") as f:
+            text = f.read()
+        self.assertIn("User." + us.id, text)
+        self.assertNotIn("Place." + pl.id, text)
+
+    def test_save_rewrites_only_dirty_shards(self):
+        us = User()
+        rv = Review()
+        models.storage.save()
+        user_shard = os.path.join("file.json.d", "User.json")
+        os.remove(user_shard)
+        rv.text = "Great stay"
+        models.storage.save()
+        self.assertFalse(os.path.exists(user_shard))
+        with open(os.path.join("file.json.d", "Review.json"), "r") as f:
+            self.assertIn("Great stay", f.read())
+
+    def test_reload_loads_every_shard(self):
+        us = User()
+        st = State()
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        self.assertIn("User." + us.id, models.storage.all())
+        self.assertIn("State." + st.id, models.storage.all())
+
+    def test_load_single_shard(self):
+        us = User()
+        st = State()
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.load(State)
+        self.assertEqual(["State." + st.id], list(models.storage.all()))
+
+
+class TestFileStorage_lazy(unittest.TestCase):
+    """Unittests for testing lazy, on-demand reload."""
+
+    def setUp(self):
+        for name in ("file.json", "file.json.d"):
+            try:
+                os.rename(name, name + ".tmp")
+            except IOError:
+                pass
+        FileStorage._FileStorage__objects = {}
+        self.us = User()
+        self.st = State()
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__lazy = True
+
+    def tearDown(self):
+        FileStorage._FileStorage__lazy = False
+        FileStorage._FileStorage__pending = False
+        FileStorage._FileStorage__sharded = False
+        FileStorage._FileStorage__objects = {}
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        shutil.rmtree("file.json.d", ignore_errors=True)
+        for name in ("file.json", "file.json.d"):
+            try:
+                os.rename(name + ".tmp", name)
+            except IOError:
+                pass
+
+    def test_reload_defers_hydration(self):
+        models.storage.reload()
+        self.assertEqual({}, FileStorage._FileStorage__objects)
+
+    def test_all_hydrates(self):
+        models.storage.reload()
+        self.assertIn("User." + self.us.id, models.storage.all())
+        self.assertIn("State." + self.st.id, models.storage.all())
+
+    def test_get_hydrates(self):
+        models.storage.reload()
+        self.assertEqual(self.us.id, models.storage.get(User, self.us.id).id)
+
+    def test_save_hydrates_before_writing(self):
+        models.storage.reload()
+        am = Amenity()
+        models.storage.save()
+        with open("file.json", "r") as f:
+            text = f.read()
+        self.assertIn("User." + self.us.id, text)
+        self.assertIn("Amenity." + am.id, text)
+
+    def test_get_builds_only_needed_object(self):
+        models.storage.reload()
+        us = models.storage.get(User, self.us.id)
+        self.assertEqual(["User." + self.us.id],
+                         list(FileStorage._FileStorage__objects))
+        self.assertIsNone(models.storage.get(User, "1234"))
+        self.assertIs(us, models.storage.all()["User." + self.us.id])
+        self.assertIn("State." + self.st.id, models.storage.all())
+
+    def test_get_keeps_changes_made_before_hydration(self):
+        models.storage.reload()
+        us = models.storage.get(User, self.us.id)
+        us.first_name = "Betty"
+        models.storage.delete(models.storage.get(State, self.st.id))
+        models.storage.save()
+        with open("file.json", "r") as f:
+            objdict = json.load(f)
+        self.assertEqual(["User." + self.us.id], list(objdict))
+        self.assertEqual("Betty", objdict["User." + self.us.id]["first_name"])
+
+    def test_get_from_journal(self):
+        FileStorage._FileStorage__journal = True
+        self.addCleanup(setattr, FileStorage, "_FileStorage__journal", False)
+        self.addCleanup(os.remove, "file.json.log")
+        models.storage.reload()
+        us = models.storage.get(User, self.us.id)
+        us.first_name = "Betty"
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        self.assertEqual("Betty",
+                         models.storage.get(User, self.us.id).first_name)
+        self.assertEqual(1, len(FileStorage._FileStorage__objects))
+
+    def test_get_loads_only_needed_shard(self):
+        FileStorage._FileStorage__sharded = True
+        FileStorage._FileStorage__lazy = False
+        FileStorage._FileStorage__objects = {"User." + self.us.id: self.us,
+                                             "State." + self.st.id: self.st}
+        FileStorage._FileStorage__dirty.update(models.storage.all())
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__lazy = True
+        models.storage.reload()
+        self.assertEqual(self.st.id, models.storage.get(State, self.st.id).id)
+        self.assertEqual(["State." + self.st.id],
+                         list(FileStorage._FileStorage__objects))
+
+
+class TestFileStorage_binary(unittest.TestCase):
+    """Unittests for testing the binary storage format."""
+
+    def setUp(self):
+        try:
+            os.rename("file.bin", "file.bin.tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__binary = True
+
+    def tearDown(self):
+        FileStorage._FileStorage__binary = False
+        FileStorage._FileStorage__objects = {}
+        try:
+            os.remove("file.bin")
+        except IOError:
+            pass
+        try:
+            os.rename("file.bin.tmp", "file.bin")
+        except IOError:
+            pass
+
+    def test_save_writes_binary_file(self):
+        User()
+        models.storage.save()
+        with open("file.bin", "rb") as f:
+            self.assertTrue(f.read().startswith(b"HBNB"))
+
+    def test_reload(self):
+        us = User()
+        us.first_name = "Betty"
+        pl = Place()
+        pl.max_guest = 4
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        objs = models.storage.all()
+        self.assertEqual(us.to_dict(), objs["User." + us.id].to_dict())
+        self.assertEqual(4, objs["Place." + pl.id].max_guest)
+
+
+class TestFileStorage_iterjson(unittest.TestCase):
+    """Unittests for testing the streaming JSON object decoder."""
+
+    def test_matches_json_load(self):
+        objdict = {}
+        for i in range(50):
+            objdict["User.{}".format(i)] = {"id": str(i), "n": [i, 1.5, None],
+                                            "s": "a, b: {c}"}
+        text = json.dumps(objdict)
+        for size in (1, 3, 7, 64, 1 << 16):
+            pairs = list(iterjson(io.StringIO(text), size))
+            self.assertEqual(list(objdict.items()), pairs)
+
+    def test_whitespace(self):
+        text = ' \n{ "a" :\t{"x": 1} ,\n "b": {} }\n'
+        self.assertEqual([("a", {"x": 1}), ("b", {})],
+                         list(iterjson(io.StringIO(text), 2)))
+
+    def test_empty_object(self):
+        self.assertEqual([], list(iterjson(io.StringIO("{}"))))
+
+    def test_reads_incrementally(self):
+        text = json.dumps({str(i): {"id": str(i)} for i in range(1000)})
+        f = io.StringIO(text)
+        pairs = iterjson(f, 16)
+        next(pairs)
+        self.assertLess(f.tell(), 100)
+
+    def test_invalid(self):
+        for text in ("", "[]", '{"a" 1}', '{"a": 1 "b": 2}', '{"a": {'):
+            with self.assertRaises(ValueError):
+                list(iterjson(io.StringIO(text), 4))
+
+
+class TestFileStorage_write_behind(unittest.TestCase):
+    """Unittests for testing the write-behind flusher."""
+
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__window = 0.2
+        self.writes = patch.object(
+            FileStorage, "_FileStorage__write", autospec=True,
+            side_effect=FileStorage._FileStorage__write)
+        self.write = self.writes.start()
+
+    def tearDown(self):
+        models.storage.flush()
+        self.writes.stop()
+        FileStorage._FileStorage__window = 0
+        FileStorage._FileStorage__threshold = 0
+        FileStorage._FileStorage__objects = {}
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+
+    def test_save_is_deferred(self):
+        User()
+        models.storage.save()
+        self.assertFalse(os.path.exists("file.json"))
+        self.write.assert_not_called()
+
+    def test_flush_writes_pending_saves_once(self):
+        us = User()
+        models.storage.save()
+        models.storage.save()
+        models.storage.flush()
+        self.assertEqual(1, self.write.call_count)
+        with open("file.json", "r") as f:
+            self.assertIn("User." + us.id, f.read())
+
+    def test_flush_without_pending_saves(self):
+        models.storage.flush()
+        self.write.assert_not_called()
+
+    def test_flusher_merges_window(self):
+        for i in range(10):
+            State().save()
+        sleep(0.5)
+        self.assertEqual(1, self.write.call_count)
+        with open("file.json", "r") as f:
+            self.assertEqual(10, len(json.load(f)))
+
+    def test_threshold_flushes_early(self):
+        FileStorage._FileStorage__window = 30
+        FileStorage._FileStorage__threshold = 3
+        for i in range(3):
+            City()
+        models.storage.save()
+        sleep(0.2)
+        self.assertEqual(1, self.write.call_count)
+
+
+class TestFileStorage_durability(unittest.TestCase):
+    """Unittests for testing atomic saves and durability levels."""
+
+    def setUp(self):
+        for name in ("file.json", "file.json.log"):
+            try:
+                os.rename(name, name + ".tmp")
+            except IOError:
+                pass
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        FileStorage._FileStorage__durability = "none"
+        FileStorage._FileStorage__journal = False
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__unsynced = set()
+        FileStorage._FileStorage__last_sync = 0.0
+        FileStorage._FileStorage__sync_interval = 1.0
+        timer = FileStorage._FileStorage__sync_timer
+        if timer is not None:
+            timer.cancel()
+            timer.join()
+        FileStorage._FileStorage__sync_timer = None
+        for name in ("file.json", "file.json.log"):
+            try:
+                os.remove(name)
+            except IOError:
+                pass
+            try:
+                os.rename(name + ".tmp", name)
+            except IOError:
+                pass
+
+    def test_failed_save_keeps_previous_file(self):
+        us = User()
+        models.storage.save()
+        st = State()
+        with patch("os.replace", side_effect=OSError):
+            with self.assertRaises(OSError):
+                models.storage.save()
+        with open("file.json", "r") as f:
+            text = f.read()
+        self.assertIn("User." + us.id, text)
+        self.assertNotIn("State." + st.id, text)
+        self.assertFalse(os.path.exists("file.json.tmp"))
+
+    def test_failed_save_keeps_objects_dirty(self):
+        st = State()
+        with patch("os.replace", side_effect=OSError):
+            with self.assertRaises(OSError):
+                models.storage.save()
+        models.storage.save()
+        with open("file.json", "r") as f:
+            self.assertIn("State." + st.id, f.read())
+
+    def test_durability_none_never_fsyncs(self):
+        User()
+        with patch("os.fsync") as fsync:
+            models.storage.save()
+        fsync.assert_not_called()
+
+    def test_durability_always_fsyncs_file_and_directory(self):
+        FileStorage._FileStorage__durability = "always"
+        User()
+        with patch("os.fsync") as fsync:
+            models.storage.save()
+        self.assertEqual(2, fsync.call_count)
+
+    def test_durability_always_fsyncs_journal(self):
+        FileStorage._FileStorage__durability = "always"
+        FileStorage._FileStorage__journal = True
+        User()
+        with patch("os.fsync") as fsync:
+            models.storage.save()
+        self.assertEqual(1, fsync.call_count)
+
+    def test_durability_batch_defers_directory_sync(self):
+        FileStorage._FileStorage__durability = "batch"
+        FileStorage._FileStorage__last_sync = float("inf")
+        User()
+        with patch("os.fsync") as fsync:
+            models.storage.save()
+            self.assertEqual(1, fsync.call_count)
+            models.storage.flush()
+            self.assertEqual(2, fsync.call_count)
+
+    def test_unknown_durability_rejected(self):
+        env = dict(os.environ, HBNB_STORAGE_DURABILITY="alwyas")
+        proc = subprocess.run([sys.executable, "-c", "import models"],
+                              env=env, stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT,
+                              universal_newlines=True)
+        self.assertNotEqual(0, proc.returncode)
+        self.assertIn("ValueError: HBNB_STORAGE_DURABILITY", proc.stdout)
+
+    def test_durability_batch_syncs_on_timer(self):
+        FileStorage._FileStorage__durability = "batch"
+        FileStorage._FileStorage__sync_interval = 0.1
+        FileStorage._FileStorage__last_sync = monotonic()
+        FileStorage._FileStorage__journal = True
+        User()
+        with patch("os.fsync") as fsync:
+            models.storage.save()
+            self.assertEqual(0, fsync.call_count)
+            FileStorage._FileStorage__sync_timer.join(5)
+            self.assertEqual(1, fsync.call_count)
+
+    def test_durability_batch_syncs_at_exit(self):
+        FileStorage._FileStorage__durability = "batch"
+        FileStorage._FileStorage__at_exit = False
+        User()
+        with patch("atexit.register") as register:
+            models.storage.save()
+        register.assert_called_once_with(models.storage.flush)
+        self.assertTrue(FileStorage._FileStorage__at_exit)
+
+
+class TestFileStorage_compaction(unittest.TestCase):
+    """Unittests for testing snapshots and compaction of the journal."""
+
+    names = ("file.json", "file.json.log", "file.json.log.1", "file.bin")
+
+    def setUp(self):
+        for name in self.names:
+            try:
+                os.rename(name, name + ".tmp")
+            except IOError:
+                pass
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__encoded = {}
+        FileStorage._FileStorage__journal = True
+
+    def tearDown(self):
+        FileStorage._FileStorage__journal = False
+        FileStorage._FileStorage__binary = False
+        FileStorage._FileStorage__lazy = False
+        FileStorage._FileStorage__pending = False
+        FileStorage._FileStorage__compact_min = 1 << 16
+        FileStorage._FileStorage__compactor = None
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__encoded = {}
+        for name in self.names:
+            try:
+                os.remove(name)
+            except IOError:
+                pass
+            try:
+                os.rename(name + ".tmp", name)
+            except IOError:
+                pass
+
+    def reload(self):
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__encoded = {}
+        models.storage.reload()
+        return models.storage.all()
+
+    def test_compact_folds_log_into_snapshot(self):
+        us = User()
+        st = State()
+        models.storage.save()
+        us.first_name = "Betty"
+        models.storage.delete(st)
+        models.storage.save()
+        models.storage.compact()
+        self.assertFalse(os.path.exists("file.json.log"))
+        self.assertFalse(os.path.exists("file.json.log.1"))
+        with open("file.json", "r") as f:
+            objdict = json.load(f)
+        self.assertEqual(["User." + us.id], list(objdict))
+        self.assertEqual("Betty", objdict["User." + us.id]["first_name"])
+        objs = self.reload()
+        self.assertEqual(["User." + us.id], list(objs))
+
+    def test_compact_writes_pending_changes(self):
+        us = User()
+        models.storage.compact()
+        self.assertIn("User." + us.id, self.reload())
+
+    def test_saves_after_compact_go_to_new_log(self):
+        us = User()
+        models.storage.save()
+        models.storage.compact()
+        st = State()
+        models.storage.save()
+        with open("file.json.log", "r") as f:
+            self.assertEqual(1, len(f.readlines()))
+        objs = self.reload()
+        self.assertIn("User." + us.id, objs)
+        self.assertIn("State." + st.id, objs)
+
+    def test_reload_replays_log_left_by_interrupted_compact(self):
+        us = User()
+        models.storage.save()
+        with patch("os.remove", side_effect=OSError):
+            with self.assertRaises(OSError):
+                models.storage.compact()
+        os.remove("file.json")
+        st = State()
+        models.storage.save()
+        objs = self.reload()
+        self.assertIn("User." + us.id, objs)
+        self.assertIn("State." + st.id, objs)
+        models.storage.compact()
+        self.assertFalse(os.path.exists("file.json.log.1"))
+        self.assertEqual(2, len(self.reload()))
+
+    def test_compact_binary_snapshot(self):
+        FileStorage._FileStorage__binary = True
+        cy = City()
+        cy.state_id = "1234"
+        models.storage.save()
+        models.storage.compact()
+        self.assertTrue(os.path.exists("file.bin"))
+        obj = self.reload()["City." + cy.id]
+        self.assertEqual("1234", obj.state_id)
+        self.assertEqual(cy.updated_at, obj.updated_at)
+
+    def test_compact_overtaken_by_another_is_dropped(self):
+        us = User()
+        models.storage.save()
+        sibling = FileStorage._FileStorage__sibling
+        overtaken = []
+
+        def overtake(storage, path, suffix):
+            if suffix == ".new" and not overtaken:
+                overtaken.append(State())
+                models.storage.save()
+                self.assertTrue(models.storage.compact())
+            return sibling(storage, path, suffix)
+
+        with patch.object(FileStorage, "_FileStorage__sibling",
+                          autospec=True, side_effect=overtake):
+            self.assertFalse(models.storage.compact())
+        self.assertFalse(os.path.exists("file.json.new"))
+        self.assertEqual({"User." + us.id, "State." + overtaken[0].id},
+                         set(self.reload()))
+
+    def test_journal_keeps_in_place_changes(self):
+        pl = Place()
+        pl.amenity_ids = []
+        models.storage.save()
+        pl.amenity_ids.append("a1")
+        models.storage.save()
+        models.storage.save()
+        with open("file.json.log", "r") as f:
+            self.assertEqual(2, len(f.readlines()))
+        self.assertEqual(["a1"],
+                         self.reload()["Place." + pl.id].amenity_ids)
+
+    def test_compact_after_lazy_reload_keeps_objects(self):
+        us = User()
+        st = State()
+        models.storage.save()
+        FileStorage._FileStorage__lazy = True
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__encoded = {}
+        models.storage.reload()
+        pl = Place()
+        models.storage.compact()
+        self.assertEqual({"User." + us.id, "State." + st.id,
+                          "Place." + pl.id}, set(self.reload()))
+
+    def test_log_growth_triggers_compaction(self):
+        FileStorage._FileStorage__compact_min = 0
+        us = User()
+        models.storage.save()
+        FileStorage._FileStorage__compactor.join()
+        self.assertFalse(os.path.exists("file.json.log"))
+        self.assertIn("User." + us.id, self.reload())
+
+
+@unittest.skipIf(fcntl is None, "fcntl is not available")
+class TestFileStorage_processes(unittest.TestCase):
+    """Unittests for testing several processes sharing the store."""
+
+    names = ("file.json", "file.json.log", "file.json.lock")
+
+    def setUp(self):
+        for name in self.names:
+            try:
+                os.rename(name, name + ".tmp")
+            except IOError:
+                pass
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__encoded = {}
+
+    def tearDown(self):
+        FileStorage._FileStorage__journal = False
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__encoded = {}
+        for name in self.names:
+            try:
+                os.remove(name)
+            except IOError:
+                pass
+            try:
+                os.rename(name + ".tmp", name)
+            except IOError:
+                pass
+
+    def run_other(self, code, wait=True):
+        env = dict(os.environ)
+        if FileStorage._FileStorage__journal:
+            env["HBNB_STORAGE_JOURNAL"] = "1"
+        proc = subprocess.Popen(
+            [sys.executable, "-c", "from models import storage\n" + code],
+            env=env, stdout=subprocess.PIPE, universal_newlines=True)
+        if wait:
+            return self.output(proc)
+        return proc
+
+    def output(self, proc):
+        out = proc.communicate(timeout=30)[0]
+        self.assertEqual(0, proc.returncode)
+        return out.strip()
+
+    def stored(self):
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__encoded = {}
+        models.storage.reload()
+        return models.storage.all()
+
+    def test_save_keeps_objects_saved_by_other_process(self):
+        us = User()
+        models.storage.save()
+        st_id = self.run_other("from models.state import State\n"
+                               "st = State()\nst.save()\nprint(st.id)")
+        pl = Place()
+        models.storage.save()
+        self.assertEqual({"User." + us.id, "State." + st_id,
+                          "Place." + pl.id},
+                         set(self.stored()))
+
+    def test_save_merges_changes_of_other_process(self):
+        us = User()
+        st = State()
+        models.storage.save()
+        self.run_other("storage.get('User', {!r}).first_name = 'Betty'\n"
+                       "storage.delete(storage.get('State', {!r}))\n"
+                       "storage.save()".format(us.id, st.id))
+        Place()
+        models.storage.save()
+        self.assertNotIn("State." + st.id, models.storage.all())
+        self.assertEqual("Betty", models.storage.get(User, us.id).first_name)
+        objs = self.stored()
+        self.assertNotIn("State." + st.id, objs)
+        self.assertEqual("Betty", objs["User." + us.id].first_name)
+
+    def test_own_changes_win(self):
+        us = User()
+        models.storage.save()
+        self.run_other("storage.get('User', {!r}).first_name = 'Betty'\n"
+                       "storage.save()".format(us.id))
+        us.first_name = "John"
+        models.storage.save()
+        self.assertEqual("John", self.stored()["User." + us.id].first_name)
+
+    def test_journal_reads_only_new_log_lines(self):
+        FileStorage._FileStorage__journal = True
+        us = User()
+        models.storage.save()
+        st_id = self.run_other("from models.state import State\n"
+                               "st = State()\nst.save()\nprint(st.id)")
+        Place()
+        with patch.object(FileStorage, "_FileStorage__read") as read:
+            models.storage.save()
+        read.assert_not_called()
+        self.assertIn("State." + st_id, models.storage.all())
+        self.assertEqual(3, len(self.stored()))
+
+    def test_unchanged_files_are_not_read_again(self):
+        User()
+        models.storage.save()
+        Place()
+        with patch.object(FileStorage, "_FileStorage__read") as read:
+            models.storage.save()
+        read.assert_not_called()
+
+    def test_writers_wait_for_lock(self):
+        User()
+        models.storage.save()
+        with open("file.json.lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            proc = self.run_other("from models.state import State\n"
+                                  "st = State()\nst.save()\nprint(st.id)",
+                                  False)
+            with self.assertRaises(subprocess.TimeoutExpired):
+                proc.wait(1)
+        self.assertIn("State." + self.output(proc), self.stored())
+
+
+class TestFileStorage_transaction(unittest.TestCase):
+    """Unittests for testing transactions."""
+
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        models.storage.rollback()
+        FileStorage._FileStorage__objects = {}
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+
+    def test_saves_are_deferred_until_commit(self):
+        with patch.object(FileStorage, "_FileStorage__write",
+                          autospec=True) as write:
+            with models.storage.transaction():
+                for i in range(10):
+                    Place().save()
+                write.assert_not_called()
+            write.assert_called_once()
+
+    def test_commit_writes_objects(self):
+        models.storage.begin()
+        pl = Place()
+        pl.save()
+        self.assertFalse(os.path.exists("file.json"))
+        self.assertTrue(models.storage.commit())
+        with open("file.json", "r") as f:
+            self.assertIn("Place." + pl.id, f.read())
+
+    def test_rollback_on_exception(self):
+        us = User()
+        us.first_name = "Betty"
+        st = State()
+        models.storage.save()
+        with self.assertRaises(ValueError):
+            with models.storage.transaction():
+                pl = Place()
+                us.first_name = "John"
+                us.last_name = "Doe"
+                models.storage.delete(st)
+                raise ValueError
+        objs = models.storage.all()
+        self.assertNotIn("Place." + pl.id, objs)
+        self.assertIs(st, objs["State." + st.id])
+        self.assertEqual("Betty", us.first_name)
+        self.assertNotIn("last_name", us.__dict__)
+        self.assertEqual({"User." + us.id: us}, models.storage.all(User))
+        self.assertFalse(models.storage.in_transaction())
+
+    def test_rollback_resets_serialized_forms(self):
+        us = User()
+        us.first_name = "Betty"
+        with self.assertRaises(ValueError):
+            with models.storage.transaction():
+                us.first_name = "John"
+                self.assertEqual("John", us.to_dict()["first_name"])
+                self.assertIn("John", str(us))
+                raise ValueError
+        self.assertEqual("Betty", us.to_dict()["first_name"])
+        self.assertIn("Betty", str(us))
+
+    def test_rollback_updates_indexes(self):
+        cy = City()
+        cy.state_id = "1234"
+        models.storage.by_attr(City, "state_id", "1234")
+        models.storage.begin()
+        cy.state_id = "5678"
+        models.storage.rollback()
+        self.assertEqual({"City." + cy.id: cy},
+                         models.storage.by_attr(City, "state_id", "1234"))
+        self.assertEqual({}, models.storage.by_attr(City, "state_id", "5678"))
+
+    def test_rollback_restores_dirty_set(self):
+        us = User()
+        models.storage.save()
+        models.storage.begin()
+        us.first_name = "Betty"
+        models.storage.rollback()
+        with patch.object(User, "to_dict") as to_dict:
+            models.storage.save()
+        to_dict.assert_not_called()
+
+    def test_nested_transactions_commit_once(self):
+        with patch.object(FileStorage, "_FileStorage__write",
+                          autospec=True) as write:
+            with models.storage.transaction():
+                with models.storage.transaction():
+                    User().save()
+                write.assert_not_called()
+            write.assert_called_once()
+
+    def test_commit_and_rollback_without_transaction(self):
+        self.assertFalse(models.storage.commit())
+        self.assertFalse(models.storage.rollback())
+
+
+class TestFileStorage_compression(unittest.TestCase):
+    """Unittests for testing compressed storage files."""
+
+    names = ("file.json.gz", "file.json.bz2", "file.json.xz", "file.bin.gz",
+             "file.json", "test_openfile.gz")
+
+    def setUp(self):
+        for name in self.names:
+            try:
+                os.rename(name, name + ".tmp")
+            except IOError:
+                pass
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__compression = "gz"
+
+    def tearDown(self):
+        FileStorage._FileStorage__compression = ""
+        FileStorage._FileStorage__binary = False
+        FileStorage._FileStorage__sharded = False
+        FileStorage._FileStorage__objects = {}
+        shutil.rmtree("file.json.d", ignore_errors=True)
+        for name in self.names:
+            try:
+                os.remove(name)
+            except IOError:
+                pass
+            try:
+                os.rename(name + ".tmp", name)
+            except IOError:
+                pass
+
+    def round_trip(self):
+        cy = City()
+        cy.state_id = "1234"
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        obj = models.storage.all()["City." + cy.id]
+        self.assertEqual(cy.to_dict(), obj.to_dict())
+
+    def test_gzip(self):
+        self.round_trip()
+        self.assertFalse(os.path.exists("file.json"))
+        with gzip.open("file.json.gz", "rt") as f:
+            self.assertEqual(1, len(json.load(f)))
+
+    def test_bz2(self):
+        FileStorage._FileStorage__compression = "bz2"
+        self.round_trip()
+        self.assertTrue(os.path.exists("file.json.bz2"))
+
+    def test_xz(self):
+        FileStorage._FileStorage__compression = "xz"
+        self.round_trip()
+        self.assertTrue(os.path.exists("file.json.xz"))
+
+    def test_binary(self):
+        FileStorage._FileStorage__binary = True
+        self.round_trip()
+        self.assertTrue(os.path.exists("file.bin.gz"))
+
+    def test_sharded(self):
+        FileStorage._FileStorage__sharded = True
+        self.round_trip()
+        self.assertEqual(["City.json.gz"], os.listdir("file.json.d"))
+
+    def test_compresses_repetitive_records(self):
+        for i in range(100):
+            cy = City()
+            cy.state_id = "1234"
+        models.storage.save()
+        with gzip.open("file.json.gz", "rb") as f:
+            size = len(f.read())
+        self.assertLess(os.path.getsize("file.json.gz") * 3, size)
+
+    def test_unknown_compression_rejected(self):
+        with patch.dict(os.environ, {"HBNB_STORAGE_COMPRESSION": "gzip"}):
+            with self.assertRaises(ValueError):
+                choice("HBNB_STORAGE_COMPRESSION", "", ("", "gz"))
+        env = dict(os.environ, HBNB_STORAGE_COMPRESSION="gzip")
+        proc = subprocess.run([sys.executable, "-c", "import models"],
+                              env=env, stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT,
+                              universal_newlines=True)
+        self.assertNotEqual(0, proc.returncode)
+        self.assertIn("ValueError: HBNB_STORAGE_COMPRESSION", proc.stdout)
+        self.assertFalse(os.path.exists("file.json.gzip"))
+
+    def test_openfile_by_extension(self):
+        with openfile("test_openfile.gz", "w") as f:
+            f.write("{}")
+        with gzip.open("test_openfile.gz", "rt") as f:
+            self.assertEqual("{}", f.read())
+        with openfile("test_openfile.gz") as f:
+            self.assertEqual("{}", f.read())
+
+
+class TestFileStorage_parallel(unittest.TestCase):
+    """Unittests for testing reloads spread over worker processes."""
+
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__workers = 3
+        FileStorage._FileStorage__parallel_min = 0
+
+    def tearDown(self):
+        FileStorage._FileStorage__workers = 0
+        FileStorage._FileStorage__parallel_min = 1 << 20
+        FileStorage._FileStorage__pending = False
+        FileStorage._FileStorage__sharded = False
+        FileStorage._FileStorage__objects = {}
+        shutil.rmtree("file.json.d", ignore_errors=True)
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+
+    def populate(self):
+        for i in range(30):
+            pl = Place()
+            pl.city_id = str(i % 4)
+            pl.name = 'Tricky }}, "City.{}": {{'.format(i)
+            cy = City()
+            cy.state_id = str(i)
+        models.storage.save()
+        return [(k, o.to_dict()) for k, o in models.storage.all().items()]
+
+    def reload(self):
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        return [(k, o.to_dict()) for k, o in models.storage.all().items()]
+
+    def test_load_range_slices_cover_file(self):
+        saved = self.populate()
+        size = os.path.getsize("file.json")
+        for n in (1, 2, 5, 17):
+            bounds = [size * i // n for i in range(n + 1)]
+            results = [load_range("file.json", bounds[i], bounds[i + 1])
+                       for i in range(n)]
+            for prev, result in zip(results, results[1:]):
+                self.assertEqual(prev[1], result[0])
+            self.assertEqual(-1, results[-1][1])
+            keys = [key for r in results for key, obj, rec in r[2]]
+            self.assertEqual([key for key, odict in saved], keys)
+
+    def test_reload_matches_sequential_reload(self):
+        saved = self.populate()
+        with patch.object(FileStorage, "_FileStorage__hydrate") as hydrate:
+            self.assertEqual(saved, self.reload())
+        hydrate.assert_not_called()
+
+    def test_reload_caches_encodings(self):
+        self.populate()
+        self.reload()
+        with patch.object(Place, "to_dict") as to_dict:
+            models.storage.save()
+        to_dict.assert_not_called()
+
+    def test_unsplittable_file_is_read_sequentially(self):
+        saved = self.populate()
+        with open("file.json", "r") as f:
+            objdict = json.load(f)
+        with open("file.json", "w") as f:
+            json.dump(objdict, f, indent=4)
+        self.assertEqual(saved, self.reload())
+
+    def test_sharded_reload(self):
+        FileStorage._FileStorage__sharded = True
+        saved = self.populate()
+        self.assertEqual(sorted(saved), sorted(self.reload()))
+
+    def test_import_with_workers(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        objdict = {}
+        for i in range(4000):
+            pl = Place(id=str(i), name="Home" * 80)
+            objdict["Place." + pl.id] = pl.to_dict()
+        with open(os.path.join(tmp, "file.json"), "w") as f:
+            json.dump(objdict, f)
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.dirname(os.path.abspath(__file__)))))
+        env = dict(os.environ, HBNB_STORAGE_WORKERS="2", PYTHONPATH=root)
+        proc = subprocess.run(
+            [sys.executable, "-c",
+             "import models\nprint(len(models.storage.all()))"],
+            cwd=tmp, env=env, stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT, universal_newlines=True, timeout=60)
+        self.assertEqual("4000", proc.stdout.strip())
+
+
+class TestFileStorage_interning(unittest.TestCase):
+    """Unittests for testing the sharing of repeated foreign keys."""
+
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        FileStorage._FileStorage__workers = 0
+        FileStorage._FileStorage__parallel_min = 1 << 20
+        FileStorage._FileStorage__pending = False
+        FileStorage._FileStorage__objects = {}
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+
+    def reload(self):
+        pl1 = Place()
+        pl1.city_id = "".join(["12", "34"])
+        pl1.amenity_ids = ["".join(["ab", "cd"])]
+        pl2 = Place()
+        pl2.city_id = "".join(["12", "34"])
+        pl2.amenity_ids = ["".join(["ab", "cd"])]
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        objs = models.storage.all()
+        return objs["Place." + pl1.id], objs["Place." + pl2.id]
+
+    def test_intern(self):
+        s = "".join(["12", "34"])
+        self.assertIs(models.storage.intern("1234"), models.storage.intern(s))
+        self.assertEqual(12, models.storage.intern(12))
+
+    def test_reload_shares_foreign_keys(self):
+        pl1, pl2 = self.reload()
+        self.assertIs(pl1.city_id, pl2.city_id)
+        self.assertIs(pl1.amenity_ids[0], pl2.amenity_ids[0])
+        self.assertIs(pl1.city_id, models.storage.intern("1234"))
+
+    def test_parallel_reload_shares_foreign_keys(self):
+        FileStorage._FileStorage__workers = 2
+        FileStorage._FileStorage__parallel_min = 0
+        pl1, pl2 = self.reload()
+        self.assertIs(pl1.city_id, pl2.city_id)
+
+
+class TestFileStorage_columns(unittest.TestCase):
+    """Unittests for testing the columnar view of numeric attributes."""
+
+    def setUp(self):
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        FileStorage._FileStorage__objects = {}
+
+    def test_columns(self):
+        for guests, price in ((2, 50), (4, 100), (6, 200)):
+            pl = Place()
+            pl.max_guest = guests
+            pl.price_by_night = price
+        cols = models.storage.columns(Place)
+        self.assertEqual(150, cols.aggregate("mean", "price_by_night",
+                                             [("max_guest", ">=", 4)]))
+
+    def test_columns_follow_changes(self):
+        pl1 = Place()
+        pl1.price_by_night = 50
+        pl2 = Place()
+        cols = models.storage.columns("Place")
+        pl2.price_by_night = 150
+        pl3 = Place()
+        pl3.price_by_night = 10
+        models.storage.delete(pl1)
+        cols = models.storage.columns("Place")
+        rows = dict(zip(cols.keys, cols.column("price_by_night")))
+        self.assertEqual({"Place." + pl2.id: 150, "Place." + pl3.id: 10},
+                         rows)
+
+    def test_columns_rebuilt_when_objects_replaced(self):
+        Place()
+        self.assertEqual(1, len(models.storage.columns(Place)))
+        FileStorage._FileStorage__objects = {}
+        self.assertEqual(0, len(models.storage.columns(Place)))
+
+    def test_columns_after_rollback(self):
+        pl = Place()
+        pl.max_guest = 2
+        models.storage.columns(Place)
+        with self.assertRaises(ValueError):
+            with models.storage.transaction():
+                pl.max_guest = 8
+                raise ValueError
+        cols = models.storage.columns(Place)
+        self.assertEqual([2], list(cols.column("max_guest")))
+
+
+class TestFileStorage_bulk_create(unittest.TestCase):
+    """Unittests for testing the creation of objects in bulk."""
+
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        FileStorage._FileStorage__objects = {}
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+
+    def test_bulk_create(self):
+        rows = [{"state_id": "".join(["12", "34"]), "name": "Fremont"},
+                {"state_id": "".join(["12", "34"])}]
+        cy1, cy2 = models.storage.bulk_create("City", rows)
+        self.assertEqual("Fremont", cy1.name)
+        self.assertIs(cy1.state_id, cy2.state_id)
+        self.assertIn(cy1, models.storage.by_attr(City, "state_id",
+                                                  "1234").values())
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        self.assertEqual("Fremont", models.storage.get(City, cy1.id).name)
+        self.assertIsNotNone(models.storage.get(City, cy2.id))
+
+    def test_bulk_create_saves_once(self):
+        with patch.object(FileStorage, "save") as save:
+            objs = models.storage.bulk_create(User, ({} for i in range(50)))
+        save.assert_called_once_with()
+        self.assertEqual(50, len(models.storage.all(User)))
+        self.assertEqual(50, len({us.id for us in objs}))
+
+    def test_bulk_create_checks_every_row_first(self):
+        us = User()
+        for rows, index in (([{}, {"updated_at": "now"}], 1),
+                            ([{"id": None}], 0),
+                            ([{}, {}, {"id": us.id}], 2),
+                            ([{"id": "1234"}, {"id": "1234"}], 1)):
+            with self.assertRaises(ValueError) as cm:
+                models.storage.bulk_create(User, rows)
+            self.assertEqual(index, cm.exception.args[1])
+            self.assertEqual(["User." + us.id], list(models.storage.all(User)))
+
+    def test_bulk_create_rolled_back(self):
+        with self.assertRaises(ValueError):
+            with models.storage.transaction():
+                models.storage.bulk_create(State, [{}, {}])
+                raise ValueError
+        self.assertEqual({}, models.storage.all(State))
+
+
+class TestFileStorage_page(unittest.TestCase):
+    """Unittests for testing cursor pagination."""
+
+    def setUp(self):
+        FileStorage._FileStorage__objects = {}
+        self.keys = []
+        for i in range(5):
+            us = User()
+            st = State()
+            self.keys += ["User." + us.id, "State." + st.id]
+
+    def tearDown(self):
+        FileStorage._FileStorage__objects = {}
+
+    def pages(self, cls, limit):
+        keys = []
+        cursor = None
+        while True:
+            objs, cursor = models.storage.page(cls, limit, cursor)
+            self.assertLessEqual(len(objs), limit)
+            keys += ["{}.{}".format(type(o).__name__, o.id) for o in objs]
+            if cursor is None:
+                return keys
+
+    def test_page_all(self):
+        self.assertEqual(sorted(self.keys), self.pages(None, 3))
+        self.assertEqual(sorted(self.keys), self.pages(None, 10))
+
+    def test_page_class(self):
+        self.assertEqual(sorted(k for k in self.keys if k[0] == "U"),
+                         self.pages(User, 2))
+        self.assertEqual(([], None), models.storage.page("Place"))
+
+    def test_page_is_stable_across_changes(self):
+        objs, cursor = models.storage.page(User, 2)
+        models.storage.delete(objs[0])
+        models.storage.delete(objs[1])
+        User()
+        rest, cursor = models.storage.page(User, 10, cursor)
+        last = "User." + objs[1].id
+        self.assertTrue(all("User." + o.id > last for o in rest))
+
+    def test_page_follows_new_and_deleted_objects(self):
+        self.pages(None, 4)
+        self.pages(User, 4)
+        us = User()
+        models.storage.delete(models.storage.get(User, self.keys[0][5:]))
+        keys = sorted(models.storage.all())
+        self.assertEqual(keys, self.pages(None, 4))
+        self.assertEqual([k for k in keys if k[0] == "U"],
+                         self.pages(User, 4))
+        self.assertIn("User." + us.id, keys)
+        FileStorage._FileStorage__objects = {}
+        self.assertEqual(([], None), models.storage.page(None))
+
+    def test_page_does_not_sort_again(self):
+        self.pages(None, 3)
+        with patch("models.engine.file_storage.sorted",
+                   create=True) as resort:
+            self.assertEqual(sorted(self.keys), self.pages(None, 3))
+        resort.assert_not_called()
+
+    def test_page_invalid(self):
+        with self.assertRaises(ValueError):
+            models.storage.page(User, 2, "abc")
+        with self.assertRaises(ValueError):
+            models.storage.page(User, 0)
+
 
 if __name__ == "__main__":
     unittest.main()
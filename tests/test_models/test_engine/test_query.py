@@ -0,0 +1,157 @@
+#!/usr/bin/python3
+"""Defines unittests for models/engine/query.py.
+
+Unittest classes:
+    TestQuery_condition
+    TestQuery_cursor
+    TestQuery
+"""
+import models
+import unittest
+from unittest.mock import MagicMock, patch
+from models.engine.file_storage import FileStorage
+from models.engine.query import Query, condition, page_keys, page_sorted
+from models.engine.query import decode_cursor, encode_cursor
+from models.city import City
+from models.place import Place
+
+
+class TestQuery_condition(unittest.TestCase):
+    """Unittests for testing the parsing of where() keywords."""
+
+    def test_condition(self):
+        self.assertEqual(("price_by_night", "lt"),
+                         condition("price_by_night__lt"))
+        self.assertEqual(("city_id", "eq"), condition("city_id"))
+        self.assertEqual(("my__attr", "eq"), condition("my__attr"))
+        self.assertEqual(("__lt", "eq"), condition("__lt"))
+
+
+class TestQuery_cursor(unittest.TestCase):
+    """Unittests for testing pagination cursors."""
+
+    def test_round_trip(self):
+        self.assertEqual("Place.1234",
+                         decode_cursor(encode_cursor("Place.1234")))
+        self.assertIsNone(decode_cursor(None))
+
+    def test_invalid_cursor(self):
+        for cursor in ("abc", "*", encode_cursor("Place"), "gA=="):
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+    def test_page_keys(self):
+        keys = ["City.b", "City.d", "City.a", "City.c", "City.e"]
+        page, cursor = page_keys(iter(keys), None, 2)
+        self.assertEqual(["City.a", "City.b"], page)
+        self.assertEqual("City.b", decode_cursor(cursor))
+        page, cursor = page_keys(iter(keys), decode_cursor(cursor), 2)
+        self.assertEqual(["City.c", "City.d"], page)
+        page, cursor = page_keys(iter(keys), decode_cursor(cursor), 2)
+        self.assertEqual((["City.e"], None), (page, cursor))
+        self.assertEqual(([], None), page_keys(iter(keys), "City.e", 2))
+        with self.assertRaises(ValueError):
+            page_keys(keys, None, 0)
+
+    def test_page_sorted(self):
+        keys = ["City.a", "City.b", "City.c", "City.d", "City.e"]
+        for start in (None, "City.", "City.b", "City.bb", "City.e"):
+            for limit in (1, 2, 5, 6):
+                self.assertEqual(page_keys(iter(keys), start, limit),
+                                 page_sorted(keys, start, limit))
+        with self.assertRaises(ValueError):
+            page_sorted(keys, None, 0)
+
+
+class TestQuery(unittest.TestCase):
+    """Unittests for testing queries over FileStorage."""
+
+    def setUp(self):
+        FileStorage._FileStorage__objects = {}
+        self.pls = []
+        for i, price in enumerate((50, 150, 80, 300)):
+            pl = Place()
+            pl.city_id = "1234" if i % 2 == 0 else "5678"
+            pl.price_by_night = price
+            pl.name = "Place {}".format(i)
+            self.pls.append(pl)
+
+    def tearDown(self):
+        FileStorage._FileStorage__objects = {}
+
+    def test_query_type(self):
+        self.assertEqual(Query, type(models.storage.query(Place)))
+
+    def test_all(self):
+        self.assertEqual(self.pls, list(models.storage.query(Place)))
+        self.assertEqual([], list(models.storage.query(City)))
+
+    def test_where(self):
+        query = models.storage.query("Place")
+        self.assertEqual([self.pls[0], self.pls[2]],
+                         list(query.where(price_by_night__lt=100)))
+        self.assertEqual([self.pls[2]],
+                         list(query.where(price_by_night__gt=50,
+                                          city_id="1234")))
+        self.assertEqual([self.pls[1], self.pls[3]],
+                         list(query.where(price_by_night__gte=100)
+                              .where(city_id__ne="1234")))
+        self.assertEqual([self.pls[0], self.pls[3]],
+                         list(query.where(price_by_night__in=(50, 300))))
+        self.assertEqual([self.pls[3]],
+                         list(query.where(name__contains="3")))
+
+    def test_where_id(self):
+        query = models.storage.query(Place).where(id=self.pls[1].id)
+        self.assertEqual([self.pls[1]], list(query))
+        self.assertEqual([], list(query.where(price_by_night=0)))
+
+    def test_where_missing_or_incomparable_attribute(self):
+        self.pls[0].rating = "good"
+        query = models.storage.query(Place)
+        self.assertEqual([], list(query.where(rating__gt=3)))
+        self.assertEqual([], list(query.where(pets=True)))
+
+    def test_queries_are_reusable(self):
+        query = models.storage.query(Place).where(city_id="1234")
+        query.limit(1).only("id")
+        self.assertEqual(list(query), list(query))
+        self.assertEqual(2, len(list(query)))
+
+    def test_only(self):
+        query = models.storage.query(Place).where(price_by_night=80)
+        self.assertEqual([{"id": self.pls[2].id, "name": "Place 2"}],
+                         list(query.only("id", "name", "pets")))
+
+    def test_limit(self):
+        query = models.storage.query(Place)
+        self.assertEqual(self.pls[:2], list(query.limit(2)))
+        self.assertEqual([], list(query.limit(0)))
+        with self.assertRaises(ValueError):
+            query.limit(-1)
+
+    def test_limit_stops_early(self):
+        seen = []
+
+        def values():
+            for pl in self.pls:
+                seen.append(pl)
+                yield pl
+        objdict = MagicMock()
+        objdict.values = values
+        with patch.object(models.storage, "all", return_value=objdict):
+            results = list(models.storage.query(Place).limit(1))
+        self.assertEqual([self.pls[0]], results)
+        self.assertEqual([self.pls[0]], seen)
+
+    def test_where_uses_index(self):
+        with patch.object(models.storage, "by_attr",
+                          wraps=models.storage.by_attr) as by_attr:
+            query = models.storage.query(Place).where(
+                price_by_night__lt=100, city_id="1234")
+            self.assertCountEqual([self.pls[0], self.pls[2]], list(query))
+        by_attr.assert_called_once_with(Place, "city_id", "1234")
+
+
+if __name__ == "__main__":
+    unittest.main()